@@ -0,0 +1,111 @@
+import asyncio
+import csv
+import json
+import os
+import re
+import time
+
+from pipeline import DEFAULT_INPUTS
+
+
+def _parse_websites(value):
+    """Accept a JSON list, or a ';' / '|' / ',' separated string of websites"""
+    if isinstance(value, list):
+        return value
+    value = (value or "").strip()
+    if value.startswith("["):
+        return json.loads(value)
+    return [site.strip() for site in re.split(r"[;|,]", value) if site.strip()]
+
+
+def _slug(text):
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")[:60] or "job"
+
+
+def parse_job(row, label="job"):
+    """
+    Turn one job row into its {job_id, inputs} dict.
+
+    Each job needs `product_name`, `websites_list` and `country_name`; `no_keywords`,
+    `score_th` and `score_ra` fall back to DEFAULT_INPUTS. An optional `job_id` names
+    the job's output directory.
+    """
+    inputs = {**DEFAULT_INPUTS}
+    inputs.update({key: value for key, value in row.items() if value not in (None, "") and key != "job_id"})
+    inputs["websites_list"] = _parse_websites(inputs.get("websites_list"))
+    inputs["no_keywords"] = int(inputs["no_keywords"])
+    inputs["score_th"] = float(inputs["score_th"])
+    inputs["score_ra"] = float(inputs["score_ra"])
+    for key in ("product_name", "websites_list", "country_name"):
+        if not inputs.get(key):
+            raise ValueError(f"{label} is missing '{key}'")
+    return {"job_id": row.get("job_id") or None, "inputs": inputs}
+
+
+def load_jobs(path):
+    """Read procurement jobs from a JSONL or CSV file, see parse_job for the fields"""
+    with open(path, encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    jobs, seen_ids = [], set()
+    for index, row in enumerate(rows, start=1):
+        job = parse_job(row, label=f"Job {index} in {path}")
+        job["job_id"] = job["job_id"] or f"{index:03d}-{_slug(job['inputs']['product_name'])}"
+        if job["job_id"] in seen_ids:
+            raise ValueError(f"Duplicate job_id '{job['job_id']}' in {path}")
+        seen_ids.add(job["job_id"])
+        jobs.append(job)
+    return jobs
+
+
+def resolve_output_root(output_root):
+    """
+    Return `output_root` relative to the current directory.
+
+    crewai strips the leading "/" of an absolute Task.output_file and rejects "..", so
+    the step files of a job under an absolute root would land in another tree than
+    the rest of its output. Raises ValueError for a root outside the current directory.
+    """
+    path = os.path.relpath(os.path.abspath(output_root))
+    if path == os.pardir or path.startswith(os.pardir + os.sep):
+        raise ValueError(f"Output root '{output_root}' is outside the current directory {os.getcwd()}; "
+                         f"crewai only writes task output files below it")
+    return path
+
+
+async def run_batch(jobs, build_job_crew, output_root="./output", max_concurrency=3):
+    """
+    Run one crew per job concurrently, at most `max_concurrency` at a time.
+
+    `build_job_crew(inputs, output_dir)` builds the crew of a job; each job writes its
+    step files to `output_root/<job_id>`. A failing job is reported in the returned
+    summary without stopping the others.
+    """
+    output_root = resolve_output_root(output_root)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _run(job):
+        output_dir = os.path.join(output_root, job["job_id"])
+        os.makedirs(output_dir, exist_ok=True)
+        async with semaphore:
+            started = time.perf_counter()
+            print(f"[{job['job_id']}] started")
+            try:
+                crew = build_job_crew(job["inputs"], output_dir)
+                await crew.kickoff_async(inputs=job["inputs"])
+                status, error = "done", None
+            except Exception as e:
+                status, error = "failed", str(e)
+            elapsed = time.perf_counter() - started
+            print(f"[{job['job_id']}] {status} in {elapsed:.1f}s")
+            return {"job_id": job["job_id"], "status": status, "error": error,
+                    "seconds": round(elapsed, 2), "output_dir": output_dir}
+
+    summary = await asyncio.gather(*[_run(job) for job in jobs])
+    os.makedirs(output_root, exist_ok=True)
+    with open(os.path.join(output_root, "batch_summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    return summary
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+
+from crewai.crews.crew_output import CrewOutput
+from crewai.tasks.task_output import TaskOutput
+from crewai.types.usage_metrics import UsageMetrics
+
+
+def _hash(value):
+    raw = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def task_config(task, llm=None):
+    """
+    Everything about a task and its agent that changes what the task produces.
+    `llm` is the model the task is routed to; it defaults to the agent's current LLM.
+    """
+    agent = task.agent
+    llm = llm or getattr(agent, "llm", None)
+    output_model = task.output_json or task.output_pydantic
+    return {
+        "description": getattr(task, "_original_description", None) or task.description,
+        "expected_output": getattr(task, "_original_expected_output", None) or task.expected_output,
+        "output_schema": output_model.model_json_schema() if output_model else None,
+        "agent": {
+            "role": agent.role,
+            "goal": agent.goal,
+            "backstory": agent.backstory,
+            "tools": sorted(tool.name for tool in agent.tools or []),
+            "model": getattr(llm, "model", str(llm)),
+            "temperature": getattr(llm, "temperature", None)
+        }
+    }
+
+
+class StepCheckpoints:
+    """
+    Fingerprinted task outputs used to skip unchanged steps on incremental re-runs.
+
+    A step's fingerprint covers the kickoff inputs, the task and agent config and the
+    raw outputs of the tasks in its context. A step is reused when its stored
+    fingerprint matches and every upstream step was reused as well; the first step
+    that has to run makes every step after it run too.
+
+    With a `router` (model_routing.ModelRouter) the fingerprint uses the model a step
+    is routed to rather than the agent's live LLM, which the escalation guardrail may
+    have switched to the large model while the step ran.
+    """
+    def __init__(self, output_dir, router=None):
+        self.directory = os.path.join(output_dir, "checkpoints")
+        self.router = router
+
+    def _path(self, step):
+        return os.path.join(self.directory, f"{step}.json")
+
+    def fingerprint(self, step, task, inputs):
+        upstream = [context_task.output.raw if context_task.output else None for context_task in task.context or []]
+        llm = self.router.llm_for(step) if self.router else None
+        return _hash({"inputs": inputs, "config": task_config(task, llm), "upstream": upstream})
+
+    def load(self, step):
+        try:
+            with open(self._path(step), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, step, task, inputs, task_output):
+        """Store a finished task's output under its fingerprint"""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(step), "w", encoding="utf-8") as f:
+            json.dump({
+                "fingerprint": self.fingerprint(step, task, inputs),
+                "raw": task_output.raw,
+                "json_dict": task_output.json_dict
+            }, f, indent=2)
+
+    def plan(self, steps, inputs):
+        """
+        Decide which of the ordered (step, task) pairs can reuse their stored output.
+
+        Reused tasks get their stored output attached as `task.output`, so downstream
+        tasks still see it as context. Returns the (step, task) pairs that have to run.
+        """
+        to_run = []
+        for step, task in steps:
+            stored = self.load(step)
+            upstream_ready = all(context_task.output is not None for context_task in task.context or [])
+            if not to_run and stored and upstream_ready and stored["fingerprint"] == self.fingerprint(step, task, inputs):
+                task.output = TaskOutput(
+                    name=task.name,
+                    description=task.description,
+                    expected_output=task.expected_output,
+                    raw=stored["raw"],
+                    json_dict=stored["json_dict"],
+                    agent=task.agent.role
+                )
+                print(f"Reusing checkpoint for step '{step}'")
+                continue
+            to_run.append((step, task))
+        return to_run
+
+
+class ReplayedCrew:
+    """Stands in for a Crew when every step was reused; kickoff returns the stored outputs"""
+    def __init__(self, tasks):
+        self.tasks = tasks
+
+    def kickoff(self, inputs=None):
+        outputs = [task.output for task in self.tasks]
+        return CrewOutput(raw=outputs[-1].raw, json_dict=outputs[-1].json_dict,
+                          tasks_output=outputs, token_usage=UsageMetrics())
+
+    async def kickoff_async(self, inputs=None):
+        return self.kickoff(inputs)
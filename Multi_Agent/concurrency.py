@@ -0,0 +1,110 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class RetryError(Exception):
+    """Raised when a call still fails after all of its retries"""
+    def __init__(self, last_error, attempts):
+        super().__init__(f"{last_error} (after {attempts} attempts)")
+        self.last_error = last_error
+        self.attempts = attempts
+
+
+class RateLimiter:
+    """Thread-safe limiter that spaces calls to at most `rate` per second"""
+    def __init__(self, rate=None):
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self):
+        """Block until the next call slot is available"""
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + 1.0 / self.rate
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class HostRateLimiter:
+    """Keeps a separate RateLimiter per host so one slow site does not throttle the others"""
+    def __init__(self, rate=None):
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._limiters = {}
+
+    def wait(self, host):
+        """Block until `host` can take another request"""
+        if not self.rate:
+            return
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limiter = self._limiters[host] = RateLimiter(self.rate)
+        limiter.wait()
+
+
+def run_concurrently(fn, items, max_workers=5):
+    """
+    Run `fn` over `items` on a bounded thread pool.
+
+    Returns a list of (item, result, error) tuples in the same order as `items`;
+    an exception raised for one item is captured instead of failing the whole batch.
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    def _safe_call(item):
+        try:
+            return item, fn(item), None
+        except Exception as e:
+            return item, None, e
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as pool:
+        return list(pool.map(_safe_call, items))
+
+
+def is_transient_error(error):
+    """
+    True for errors worth retrying: timeouts, dropped connections, 429 and 5xx responses.
+    Other 4xx errors (bad request, auth, out of credits) fail the same way on every attempt.
+    """
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    name = type(error).__name__.lower()
+    return "timeout" in name or "connectionerror" in name
+
+
+def retry_with_backoff(fn, retries=2, backoff=1.0, max_backoff=30.0, retry_on=None, on_retry=None):
+    """
+    Call `fn` up to `retries` extra times with jittered exponential backoff, raising RetryError at the end.
+
+    With `retry_on`, only errors for which it returns True are retried; others are
+    raised as is. `on_retry(error, delay)` is called before each backoff sleep.
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            return fn()
+        except Exception as e:
+            if retry_on is not None and not retry_on(e):
+                raise
+            if attempt > retries:
+                raise RetryError(e, attempt) from e
+            delay = min(max_backoff, backoff * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+            if on_retry is not None:
+                on_retry(e, delay)
+            time.sleep(delay)
@@ -0,0 +1,125 @@
+import hashlib
+import json
+from typing import List, Optional
+
+import numpy as np
+from chromadb import Documents, EmbeddingFunction, Embeddings
+from pydantic import Field, PrivateAttr
+from crewai import Crew
+from crewai.knowledge.knowledge import Knowledge
+from crewai.knowledge.storage.knowledge_storage import KnowledgeStorage
+from crewai.utilities.embedding_configurator import EmbeddingConfigurator
+
+
+DEFAULT_EMBEDDER_NAME = "openai/text-embedding-3-small"
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class CachedEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    Chroma embedding function that keeps every vector in the response cache.
+
+    Vectors are keyed by the embedder name and the hash of the text, so knowledge
+    chunks, memory items and repeated queries are only embedded once across runs;
+    the texts that miss the cache are embedded in a single call to the wrapped
+    embedding function. Give the "embedding" namespace no TTL in the cache.
+    """
+    def __init__(self, embedding_function, cache, name=DEFAULT_EMBEDDER_NAME):
+        self.embedding_function = embedding_function
+        self.cache = cache
+        self.embedder_name = name
+
+    @classmethod
+    def from_config(cls, embedder_config, cache):
+        """Wrap the embedding function crewai builds for an `embedder` config (None is crewai's default)"""
+        name = DEFAULT_EMBEDDER_NAME
+        if embedder_config:
+            name = json.dumps([embedder_config.get("provider"), (embedder_config.get("config") or {}).get("model")])
+        return cls(EmbeddingConfigurator().configure_embedder(embedder_config), cache, name=name)
+
+    def __call__(self, input: Documents) -> Embeddings:
+        vectors = [self.cache.get("embedding", self.embedder_name, text_hash(text)) for text in input]
+        missing = [index for index, vector in enumerate(vectors) if vector is None]
+        if missing:
+            embedded = self.embedding_function([input[index] for index in missing])
+            for index, vector in zip(missing, embedded):
+                vectors[index] = [float(value) for value in vector]
+                self.cache.set("embedding", vectors[index], self.embedder_name, text_hash(input[index]))
+        return [np.array(vector, dtype=np.float32) for vector in vectors]
+
+    def as_embedder(self):
+        """Return the crewai `embedder` config that uses this function"""
+        return {"provider": "custom", "config": {"embedder": self}}
+
+
+class IncrementalKnowledgeStorage(KnowledgeStorage):
+    """
+    Knowledge storage that only adds the chunks missing from the persistent collection.
+
+    crewai ids every chunk by the hash of its text, so unchanged content is found by
+    id and neither embedded nor upserted again; `prune` removes the chunks of
+    content that changed or is no longer a knowledge source.
+    """
+    def __init__(self, embedder=None, collection_name=None):
+        super().__init__(embedder=embedder, collection_name=collection_name)
+        self._current_ids = set()
+
+    def save(self, documents, metadata=None):
+        if not self.collection:
+            raise Exception("Collection not initialized")
+        ids = [text_hash(document) for document in documents]
+        self._current_ids.update(ids)
+        existing = set(self.collection.get(ids=ids, include=[])["ids"]) if ids else set()
+        new = [index for index, doc_id in enumerate(ids) if doc_id not in existing]
+        print(f"Knowledge: {len(documents) - len(new)} chunks unchanged, {len(new)} to embed")
+        if new:
+            if isinstance(metadata, list):
+                metadata = [metadata[index] for index in new]
+            super().save([documents[index] for index in new], metadata)
+
+    def prune(self):
+        """Delete the stored chunks that no source added in this run"""
+        stale = [doc_id for doc_id in self.collection.get(include=[])["ids"] if doc_id not in self._current_ids]
+        if stale:
+            self.collection.delete(ids=stale)
+            print(f"Knowledge: removed {len(stale)} stale chunks")
+
+
+def build_knowledge(sources, embedder=None, collection_name="crew"):
+    """Build the crew Knowledge on an IncrementalKnowledgeStorage, like Crew does for `knowledge_sources`"""
+    storage = IncrementalKnowledgeStorage(embedder=embedder, collection_name=collection_name)
+    knowledge = Knowledge(collection_name=collection_name, sources=sources, embedder=embedder, storage=storage)
+    storage.prune()
+    return knowledge
+
+
+class MemoryScopedCrew(Crew):
+    """
+    Crew whose memory is switched off while the tasks named in `memoryless_tasks` run.
+
+    crewai only has crew-wide memory; for these tasks the crew neither builds a
+    memory context for the prompt nor saves short-term, long-term or entity items,
+    which saves their embedding and evaluation calls.
+    """
+    memoryless_tasks: List[str] = Field(default_factory=list)
+    _memories: Optional[tuple] = PrivateAttr(default=None)
+
+    def _scope_memory(self, enabled):
+        if self._memories is None:
+            self._memories = (self.memory, self._short_term_memory, self._long_term_memory,
+                              self._entity_memory, self._external_memory)
+        if enabled:
+            (self.memory, self._short_term_memory, self._long_term_memory,
+             self._entity_memory, self._external_memory) = self._memories
+        else:
+            self.memory = False
+            self._short_term_memory = self._long_term_memory = self._entity_memory = self._external_memory = None
+
+    def _get_agent_to_use(self, task):
+        # Called right before each task of a sequential crew is executed
+        if self.memory or self._memories is not None:
+            self._scope_memory(task.name not in self.memoryless_tasks)
+        return super()._get_agent_to_use(task)
@@ -0,0 +1,45 @@
+import json
+
+from crewai.tasks.task_output import TaskOutput
+
+
+def _with_raw(task_output, raw):
+    """Copy of a TaskOutput whose raw text was replaced by a guardrail"""
+    try:
+        json_dict = json.loads(raw)
+    except ValueError:
+        json_dict = None
+    return task_output.model_copy(update={
+        "raw": raw, "json_dict": json_dict if isinstance(json_dict, dict) else None, "pydantic": None
+    })
+
+
+def chain_guardrails(*guardrails):
+    """
+    Combine task guardrails into one, run in order.
+
+    Each guardrail gets the output returned by the previous one; the chain stops at
+    the first failure. None entries are skipped, and None is returned when no
+    guardrail is left, so the result can be passed to Task(guardrail=...) as is.
+    """
+    guardrails = [guardrail for guardrail in guardrails if guardrail is not None]
+    if not guardrails:
+        return None
+    if len(guardrails) == 1:
+        return guardrails[0]
+
+    def chained(task_output):
+        raw_changed = False
+        for guardrail in guardrails:
+            ok, result = guardrail(task_output)
+            if not ok:
+                return False, result
+            if isinstance(result, TaskOutput):
+                task_output = result
+            elif isinstance(result, str):
+                task_output = _with_raw(task_output, result)
+                raw_changed = True
+        # A new raw text is returned as a string so crewai re-parses it into the output model
+        return True, task_output.raw if raw_changed else task_output
+
+    return chained
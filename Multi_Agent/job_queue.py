@@ -0,0 +1,215 @@
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from batch_jobs import _slug, parse_job, resolve_output_root
+
+
+JOB_COLUMNS = ("job_id", "inputs", "status", "error", "output_dir", "worker",
+               "enqueued_at", "started_at", "finished_at", "attempts")
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(fraction * len(values)))], 2)
+
+
+class JobQueue:
+    """
+    Local queue of procurement jobs kept in SQLite.
+
+    Jobs go from "queued" to "running" when a worker claims them and end as "done" or
+    "failed". Claiming is a single write transaction, so several worker processes can
+    share one queue file. Every job keeps its enqueue, start and finish times, which
+    `stats` turns into queue wait and run time figures.
+    """
+    def __init__(self, path="./cache/jobs.sqlite"):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                inputs TEXT NOT NULL,
+                status TEXT NOT NULL,
+                error TEXT,
+                output_dir TEXT,
+                worker TEXT,
+                enqueued_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                attempts INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, enqueued_at);
+        """)
+
+    def _row(self, row):
+        job = dict(zip(JOB_COLUMNS, row))
+        job["inputs"] = json.loads(job["inputs"])
+        if job["started_at"]:
+            job["queue_seconds"] = round(job["started_at"] - job["enqueued_at"], 2)
+        if job["finished_at"]:
+            job["run_seconds"] = round(job["finished_at"] - job["started_at"], 2)
+        return job
+
+    def enqueue(self, row):
+        """Validate a job row (see batch_jobs.parse_job) and queue it; returns the job_id"""
+        job = parse_job(row)
+        job_id = job["job_id"] or f"{time.strftime('%Y%m%d-%H%M%S')}-{_slug(job['inputs']['product_name'])}-{uuid.uuid4().hex[:6]}"
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT INTO jobs (job_id, inputs, status, enqueued_at) VALUES (?, ?, 'queued', ?)",
+                    (job_id, json.dumps(job["inputs"]), time.time())
+                )
+            except sqlite3.IntegrityError:
+                raise ValueError(f"Duplicate job_id '{job_id}' in the job queue")
+        return job_id
+
+    def claim(self, worker):
+        """Mark the oldest queued job as running for `worker` and return it, or None when the queue is empty"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE status = 'queued' ORDER BY enqueued_at LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    started_at = time.time()
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', worker = ?, started_at = ?, finished_at = NULL, "
+                        "error = NULL, attempts = attempts + 1 WHERE job_id = ?",
+                        (worker, started_at, row[0])
+                    )
+                    row = (*row[:5], worker, row[6], started_at, None, row[9] + 1)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return None if row is None else self._row(row)
+
+    def finish(self, job_id, status, error=None, output_dir=None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, output_dir = COALESCE(?, output_dir), finished_at = ? "
+                "WHERE job_id = ?",
+                (status, error, output_dir, time.time(), job_id)
+            )
+
+    def requeue_stale(self, max_runtime):
+        """Put back jobs that have been running for more than `max_runtime` seconds (e.g. their worker died)"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL WHERE status = 'running' AND started_at < ?",
+                (time.time() - max_runtime,)
+            )
+        return cursor.rowcount
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return None if row is None else self._row(row)
+
+    def jobs(self, status=None, limit=20):
+        """Return the most recently enqueued jobs, optionally only those with `status`"""
+        where, params = ("WHERE status = ?", (status,)) if status else ("", ())
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs {where} ORDER BY enqueued_at DESC LIMIT ?",
+                (*params, limit)
+            ).fetchall()
+        return [self._row(row) for row in rows]
+
+    @property
+    def stats(self):
+        """Job counts per status and queue wait / run time (mean and p95) of the finished jobs"""
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            timings = self._conn.execute(
+                "SELECT started_at - enqueued_at, finished_at - started_at FROM jobs "
+                "WHERE status IN ('done', 'failed') AND finished_at IS NOT NULL"
+            ).fetchall()
+        waits, runs = [t[0] for t in timings], [t[1] for t in timings]
+        return {
+            "counts": counts,
+            "mean_queue_seconds": round(sum(waits) / len(waits), 2) if waits else None,
+            "p95_queue_seconds": _percentile(waits, 0.95),
+            "mean_run_seconds": round(sum(runs) / len(runs), 2) if runs else None,
+            "p95_run_seconds": _percentile(runs, 0.95),
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class QueueWorker:
+    """
+    Long-running consumer of a JobQueue.
+
+    `build_job_crew(inputs, output_dir)` builds the crew of a job; it is expected to
+    reuse the process-wide clients, caches, LLMs and rate limiters, so imports and
+    connection setup are paid once per worker rather than once per job. Up to
+    `max_concurrency` jobs run at a time; each writes to `output_root/<job_id>`,
+    which has to be inside the current directory (see batch_jobs.resolve_output_root).
+    """
+    def __init__(self, queue, build_job_crew, output_root="./output", max_concurrency=3,
+                 poll_interval=2.0, worker_id=None):
+        self.queue = queue
+        self.build_job_crew = build_job_crew
+        self.output_root = resolve_output_root(output_root)
+        self.max_concurrency = max_concurrency
+        self.poll_interval = poll_interval
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.processed = 0
+
+    async def _run(self, job):
+        output_dir = os.path.join(self.output_root, job["job_id"])
+        os.makedirs(output_dir, exist_ok=True)
+        print(f"[{job['job_id']}] started after {job['queue_seconds']:.1f}s in the queue")
+        started = time.perf_counter()
+        try:
+            crew = self.build_job_crew(job["inputs"], output_dir)
+            await crew.kickoff_async(inputs=job["inputs"])
+            status, error = "done", None
+        except Exception as e:
+            status, error = "failed", str(e)
+        self.queue.finish(job["job_id"], status, error=error, output_dir=output_dir)
+        self.processed += 1
+        print(f"[{job['job_id']}] {status} in {time.perf_counter() - started:.1f}s")
+
+    async def run(self, once=False, max_jobs=None):
+        """
+        Claim and run jobs until stopped. With `once`, return as soon as the queue is
+        empty and the running jobs are finished; `max_jobs` stops after that many jobs.
+        """
+        print(f"Worker {self.worker_id} consuming {self.queue.path}, {self.max_concurrency} jobs at a time")
+        running = set()
+        claimed = 0
+        while True:
+            job = None
+            if len(running) < self.max_concurrency and (max_jobs is None or claimed < max_jobs):
+                job = self.queue.claim(self.worker_id)
+            if job is not None:
+                claimed += 1
+                running.add(asyncio.create_task(self._run(job)))
+                continue
+            if not running and (once or (max_jobs is not None and claimed >= max_jobs)):
+                break
+            if running:
+                _, running = await asyncio.wait(running, timeout=self.poll_interval,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+            else:
+                await asyncio.sleep(self.poll_interval)
+        print(f"Worker {self.worker_id} stopped after {self.processed} jobs: {self.queue.stats}")
+        return self.processed
@@ -0,0 +1,34 @@
+from crewai import LLM
+
+
+class CachedLLM(LLM):
+    """
+    crewai LLM that answers repeated prompts from a ResponseCache.
+
+    Completions are keyed by model, temperature, the full message list and the tool
+    schemas, so any change to the prompt or the agent's tools is a cache miss.
+    Without a cache it behaves exactly like LLM.
+    """
+    cache_namespace = "llm"
+
+    def __init__(self, model, cache=None, **kwargs):
+        super().__init__(model=model, **kwargs)
+        self.cache = cache
+
+    def _cache_key(self, messages, tools):
+        return [self.model, self.temperature, messages, tools or []]
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None):
+        if self.cache is None:
+            return super().call(messages, tools=tools, callbacks=callbacks, available_functions=available_functions)
+
+        key = self._cache_key(messages, tools)
+        cached = self.cache.get(self.cache_namespace, *key)
+        if cached is not None:
+            return cached
+
+        response = super().call(messages, tools=tools, callbacks=callbacks, available_functions=available_functions)
+        # Only plain text completions are cached; tool call results depend on live tools
+        if isinstance(response, str) and response.strip():
+            self.cache.set(self.cache_namespace, response, *key)
+        return response
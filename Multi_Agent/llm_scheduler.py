@@ -0,0 +1,169 @@
+import threading
+import time
+from collections import deque
+
+from crewai import LLM
+
+from concurrency import RetryError, retry_with_backoff
+from llm_cache import CachedLLM
+
+
+WINDOW_SECONDS = 60.0
+
+
+def is_rate_limit_error(error):
+    """True for provider 429 / rate limit errors (litellm RateLimitError and friends)"""
+    if getattr(error, "status_code", None) == 429:
+        return True
+    text = f"{type(error).__name__} {error}".lower()
+    return "ratelimit" in text or "rate limit" in text or "429" in text
+
+
+def estimate_tokens(messages):
+    """Rough token count of a prompt: about 4 characters per token"""
+    if isinstance(messages, str):
+        return len(messages) // 4 + 1
+    return sum(len(str(message.get("content") or "")) for message in messages) // 4 + 1
+
+
+class _ModelState:
+    def __init__(self):
+        self.window = deque()
+        self.waiting = 0
+        self.stats = {"requests": 0, "tokens": 0, "queued": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0,
+                      "max_queue_depth": 0, "rate_limit_retries": 0, "failures": 0}
+
+
+class LLMScheduler:
+    """
+    Shared, thread-safe scheduler for LLM requests.
+
+    Keeps every model under its requests-per-minute and tokens-per-minute budget
+    over a sliding one minute window: a request that would go over the budget waits
+    in line until enough of the window has expired. Requests that still get a 429
+    are retried with jittered exponential backoff. `limits` maps a model name to
+    (rpm, tpm); a limit of None means unlimited. `stats` reports per model request
+    and token counts, queue depth and time spent waiting.
+    """
+    def __init__(self, limits=None, default_rpm=None, default_tpm=None, max_retries=5, backoff=2.0, max_backoff=60.0):
+        self.limits = dict(limits or {})
+        self.default_rpm = default_rpm
+        self.default_tpm = default_tpm
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._cond = threading.Condition()
+        self._models = {}
+
+    def _state(self, model):
+        if model not in self._models:
+            self._models[model] = _ModelState()
+        return self._models[model]
+
+    def _limits(self, model):
+        return self.limits.get(model, (self.default_rpm, self.default_tpm))
+
+    def acquire(self, model, tokens):
+        """Wait for room in the model's budget and reserve it; returns the window entry"""
+        rpm, tpm = self._limits(model)
+        started = time.monotonic()
+        with self._cond:
+            state = self._state(model)
+            state.waiting += 1
+            state.stats["max_queue_depth"] = max(state.stats["max_queue_depth"], state.waiting)
+            try:
+                while True:
+                    now = time.monotonic()
+                    while state.window and now - state.window[0][0] >= WINDOW_SECONDS:
+                        state.window.popleft()
+                    used = sum(entry[1] for entry in state.window)
+                    # A request larger than the whole token budget runs alone in an empty window
+                    if (rpm is None or len(state.window) < rpm) and \
+                            (tpm is None or not state.window or used + tokens <= tpm):
+                        break
+                    self._cond.wait(max(0.05, state.window[0][0] + WINDOW_SECONDS - now))
+            finally:
+                state.waiting -= 1
+
+            waited = time.monotonic() - started
+            if waited > 0.01:
+                state.stats["queued"] += 1
+            state.stats["wait_seconds"] += waited
+            state.stats["max_wait_seconds"] = max(state.stats["max_wait_seconds"], waited)
+            state.stats["requests"] += 1
+            entry = [time.monotonic(), tokens]
+            state.window.append(entry)
+            return entry
+
+    def settle(self, model, entry, tokens):
+        """Replace a reservation's estimated tokens with the actual count"""
+        with self._cond:
+            self._state(model).stats["tokens"] += tokens
+            entry[1] = tokens
+            self._cond.notify_all()
+
+    def run(self, model, fn, prompt_tokens, completion_tokens=lambda result: 0):
+        """Run `fn` within the model's budget, retrying rate limit errors; returns its result"""
+        def attempt():
+            entry = self.acquire(model, prompt_tokens)
+            try:
+                result = fn()
+            except Exception:
+                self.settle(model, entry, prompt_tokens)
+                raise
+            self.settle(model, entry, prompt_tokens + completion_tokens(result))
+            return result
+
+        def on_retry(error, delay):
+            with self._cond:
+                self._state(model).stats["rate_limit_retries"] += 1
+            print(f"Rate limited on {model}, retrying in {delay:.1f}s")
+
+        try:
+            return retry_with_backoff(attempt, retries=self.max_retries, backoff=self.backoff,
+                                      max_backoff=self.max_backoff, retry_on=is_rate_limit_error, on_retry=on_retry)
+        except RetryError as e:
+            with self._cond:
+                self._state(model).stats["failures"] += 1
+            raise e.last_error
+
+    @property
+    def queue_depth(self):
+        """Requests currently waiting, per model"""
+        with self._cond:
+            return {model: state.waiting for model, state in self._models.items()}
+
+    @property
+    def stats(self):
+        with self._cond:
+            return {
+                model: {key: round(value, 3) if isinstance(value, float) else value for key, value in state.stats.items()}
+                for model, state in sorted(self._models.items())
+            }
+
+
+class ScheduledLLM(LLM):
+    """
+    crewai LLM whose calls go through a shared LLMScheduler.
+
+    Without a scheduler it behaves exactly like LLM. Combine it with CachedLLM by
+    putting CachedLLM first in the bases, so cache hits never wait for the budget.
+    """
+    def __init__(self, model, scheduler=None, **kwargs):
+        super().__init__(model=model, **kwargs)
+        self.scheduler = scheduler
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None):
+        if self.scheduler is None:
+            return super().call(messages, tools=tools, callbacks=callbacks, available_functions=available_functions)
+        return self.scheduler.run(
+            self.model,
+            lambda: super(ScheduledLLM, self).call(messages, tools=tools, callbacks=callbacks,
+                                                   available_functions=available_functions),
+            prompt_tokens=estimate_tokens(messages),
+            completion_tokens=lambda result: len(result) // 4 if isinstance(result, str) else 0
+        )
+
+
+class CachedScheduledLLM(CachedLLM, ScheduledLLM):
+    """LLM answering repeated prompts from the response cache and scheduling the others"""
@@ -1,103 +1,297 @@
 # Initialize all your components
-from crewai import Crew, Process, LLM
-import agentops
-from tavily import TavilyClient
-from scrapegraph_py import Client
-from dotenv import load_dotenv
+# Heavy libraries (crewai, agentops, tavily, scrapegraph_py) and API clients are only
+# imported and built on first use, so health checks and batch workers start fast.
+import argparse
 import os
-# Import your other agents from their respective files
-from search_queries_recommendation import SearchQueryRecommender
-from search_engine import SearchEngine
-from web_scraping import ScrapingAgent
-from procurement_report_author import procurement_report_agent
-from procurement_report_critic import procurement_report_critic_agent
+import sys
+from functools import lru_cache
+from concurrency import HostRateLimiter
 
 
 #Key Needed
-load_dotenv()
-agentops_key = os.getenv("AGENTOPS_API_KEY")
-agentops.init(
-    api_key=agentops_key,
-    skip_auto_end_session=True,
-    default_tags=['crewai']
-)
-search_client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
-scrape_client = Client(api_key=os.getenv("SGAI_API_KEY"))
+@lru_cache(maxsize=None)
+def load_env():
+    from dotenv import load_dotenv
+    load_dotenv()
+    return True
+
+
+@lru_cache(maxsize=None)
+def init_agentops():
+    """Start an AgentOps session if a key is configured; local run metrics are always written"""
+    load_env()
+    agentops_key = os.getenv("AGENTOPS_API_KEY")
+    if not agentops_key or os.getenv("AGENTOPS_DISABLED", "0") == "1":
+        return False
+    import agentops
+    agentops.init(
+        api_key=agentops_key,
+        skip_auto_end_session=True,
+        default_tags=['crewai']
+    )
+    return True
+
+
+def pool_connections(client):
+    """
+    Size the client's requests.Session pool for the crews of the process that share it.
+    The new adapters keep the retry policy of the ones the client mounted.
+    """
+    session = getattr(client, "session", None)
+    if session is not None:
+        from requests.adapters import HTTPAdapter
+        size = int(os.getenv("HTTP_POOL_SIZE", "20"))
+        for prefix in ("https://", "http://"):
+            retries = session.get_adapter(prefix).max_retries
+            session.mount(prefix, HTTPAdapter(pool_connections=size, pool_maxsize=size, max_retries=retries))
+    return client
+
+
+@lru_cache(maxsize=None)
+def get_search_client():
+    load_env()
+    from tavily import TavilyClient
+    return pool_connections(TavilyClient(api_key=os.getenv("TAVILY_API_KEY")))
+
+
+@lru_cache(maxsize=None)
+def get_scrape_client():
+    load_env()
+    from scrapegraph_py import Client
+    # The client's own timeout ends a slow scrape, so a retry never overlaps a still running paid call
+    return pool_connections(Client(api_key=os.getenv("SGAI_API_KEY"), timeout=float(os.getenv("SCRAPE_TIMEOUT", "60"))))
+
+
+@lru_cache(maxsize=None)
+def get_page_fetcher():
+    """Pooled http client for the site adapters, or None when SITE_ADAPTERS=0 sends every page to smartscraper"""
+    load_env()
+    if os.getenv("SITE_ADAPTERS", "1") != "1":
+        return None
+    from site_adapters import PageFetcher
+    size = int(os.getenv("HTTP_POOL_SIZE", "20"))
+    return PageFetcher(timeout=float(os.getenv("PAGE_FETCH_TIMEOUT", "20")), pool_size=size)
+
+
+@lru_cache(maxsize=None)
+def get_response_cache():
+    load_env()
+    from response_cache import ResponseCache
+    return ResponseCache(
+        path=os.getenv("RESPONSE_CACHE_PATH", "./cache/responses.sqlite"),
+        ttls={"search": 6 * 3600, "scrape": 24 * 3600, "llm": 7 * 24 * 3600, "embedding": None}
+    )
+
+
+@lru_cache(maxsize=None)
+def get_price_store():
+    load_env()
+    from price_store import PriceStore
+    return PriceStore(path=os.getenv("PRICE_STORE_PATH", "./cache/prices.sqlite"))
+
+
+@lru_cache(maxsize=None)
+def get_job_queue():
+    load_env()
+    from job_queue import JobQueue
+    return JobQueue(path=os.getenv("JOB_QUEUE_PATH", "./cache/jobs.sqlite"))
+
+
+@lru_cache(maxsize=None)
+def get_rate_limits():
+    """Per-provider limits shared by every crew of the process: (search limiter, scrape limiter, Groq rpm, Groq tpm)"""
+    load_env()
+    return (
+        HostRateLimiter(float(os.getenv("TAVILY_RPS", "5"))),
+        HostRateLimiter(float(os.getenv("SCRAPE_RPS_PER_HOST", "2"))),
+        int(os.getenv("GROQ_RPM", "30")),
+        int(os.getenv("GROQ_TPM", "6000"))
+    )
+
+
+@lru_cache(maxsize=None)
+def get_llm_scheduler():
+    """Scheduler keeping every Groq model of the process under its request and token budget"""
+    from llm_scheduler import LLMScheduler
+    _, _, groq_rpm, groq_tpm = get_rate_limits()
+    return LLMScheduler(default_rpm=groq_rpm, default_tpm=groq_tpm)
 
 
 #LLM
-groq_llm = LLM(
-    model="groq/llama-3.1-8b-instant",
-    temperature=0.1
-)
-groq_llm2 = LLM(
-    model="groq/llama-3.3-70b-versatile",
-    temperature=0.1
-)
+@lru_cache(maxsize=None)
+def get_llms():
+    """Return the (small, large) Groq LLMs"""
+    load_env()
+    from llm_scheduler import CachedScheduledLLM
+    # Set LLM_CACHE=1 to answer repeated prompts from the response cache (reruns, debugging)
+    llm_cache = get_response_cache() if os.getenv("LLM_CACHE", "0") == "1" else None
+    groq_llm = CachedScheduledLLM(
+        model="groq/llama-3.1-8b-instant",
+        temperature=0.1,
+        cache=llm_cache,
+        scheduler=get_llm_scheduler()
+    )
+    groq_llm2 = CachedScheduledLLM(
+        model="groq/llama-3.3-70b-versatile",
+        temperature=0.1,
+        cache=llm_cache,
+        scheduler=get_llm_scheduler()
+    )
+    return groq_llm, groq_llm2
+
 
 #main.py
-def main():
-    from crewai.knowledge.source.string_knowledge_source import StringKnowledgeSource
+def make_crew(inputs, output_dir, incremental=False, streaming=False):
+    """Build a crew wired to the process-wide clients, caches and rate limits"""
+    from pipeline import build_crew
 
-    # Initialize the search recommender
-    output_dir=r"./output"
-    search_recommender = SearchQueryRecommender(llm=groq_llm, output_dir=output_dir)
-    search_engine = SearchEngine(llm=groq_llm2, output_dir=output_dir, search_client=search_client)
-    web_scraping = ScrapingAgent(llm=groq_llm2, output_dir=output_dir, scrape_client=scrape_client)
-    procurement_report_author = procurement_report_agent(llm=groq_llm2, output_dir=output_dir)
-    procurement_report_critic = procurement_report_critic_agent(llm=groq_llm2, output_dir=output_dir)
-
-    #context_dependency
-    search_engine.set_context_dependency(search_recommender.get_task)
-    web_scraping.set_context_dependency(search_engine.get_task)
-    procurement_report_author.set_context_dependency(web_scraping.get_task)
-    procurement_report_critic.set_critique_context(procurement_report_author.get_task)
-    procurement_report_critic.set_revision_context(procurement_report_author.get_task,procurement_report_critic.get_critique_task,procurement_report_author.get_agent)
-    
-
-    #knowledge_sources
-    about_company = "ohay is a company that provides AI solutions to help websites refine their search and recommendation systems."
-    company_context = StringKnowledgeSource(
-        content=about_company
+    init_agentops()
+    groq_llm, groq_llm2 = get_llms()
+    search_rate_limiter, scrape_rate_limiter, _, _ = get_rate_limits()
+    return build_crew(
+        inputs, output_dir,
+        llm=groq_llm, llm2=groq_llm2,
+        search_client=get_search_client(), scrape_client=get_scrape_client(),
+        response_cache=get_response_cache(),
+        search_rate_limiter=search_rate_limiter, scrape_rate_limiter=scrape_rate_limiter,
+        # Groq request and token budgets are enforced by the shared LLM scheduler
+        incremental=incremental,
+        streaming=streaming,
+        revision_rounds=int(os.getenv("REPORT_REVISION_ROUNDS", "2")),
+        price_store=get_price_store(),
+        page_fetcher=get_page_fetcher(),
+        # quality | balanced | fast, see model_routing.ROUTING_PROFILES
+        routing=os.getenv("MODEL_ROUTING", "balanced")
     )
 
-    # Create the crew
-    Ohay_crew = Crew(
-        agents=[
-            search_recommender.get_agent,
-            search_engine.get_agent,
-            web_scraping.get_agent,
-            procurement_report_author.get_agent,
-            procurement_report_critic.get_agent
-        ],
-        tasks=[
-            search_recommender.get_task,
-            search_engine.get_task,
-            web_scraping.get_task,
-            procurement_report_author.get_task,
-            procurement_report_critic.get_critique_task,
-            procurement_report_critic.get_revision_task
-        ],
-        process=Process.sequential,
-        knowledge_sources=[company_context],  # Make sure company_context is defined
-        memory=True
-    )
-    
+
+def main(incremental=False, streaming=False):
+    inputs = {
+        "product_name": "Coffee Machine for the Office",
+        "websites_list": ["www.amazon.eg", "www.jumia.com.eg", "www.noon.com/saudi-en"],
+        "country_name": "Saudi",
+        "no_keywords": 10,
+        "score_th": 0.10,
+        "score_ra": 3.5
+    }
+
+    output_dir=r"./output"
+    Ohay_crew = make_crew(inputs, output_dir, incremental=incremental, streaming=streaming)
+
     # Execute the crew
-    result = Ohay_crew.kickoff(
-        inputs={
-            "product_name": "Coffee Machine for the Office",
-            "websites_list": ["www.amazon.eg", "www.jumia.com.eg", "www.noon.com/saudi-en"],
-            "country_name": "Saudi",
-            "no_keywords": 10,
-            "score_th": 0.10,
-            "score_ra": 3.5
-        }
-    )
-    
+    result = Ohay_crew.kickoff(inputs=inputs)
+
     print("=== RESULTS ===")
     print(result)
+    print(f"Response cache: {get_response_cache().stats}")
+    print(f"LLM scheduler: {get_llm_scheduler().stats}")
     return result
 
+
+def main_batch(jobs_path, output_root="./output", max_concurrency=3, incremental=False, streaming=False):
+    """Run every job of a JSONL/CSV file, each crew writing to its own output directory"""
+    import asyncio
+    from batch_jobs import load_jobs, run_batch
+
+    jobs = load_jobs(jobs_path)
+    print(f"Running {len(jobs)} jobs, {max_concurrency} at a time")
+    summary = asyncio.run(run_batch(
+        jobs,
+        lambda inputs, output_dir: make_crew(inputs, output_dir, incremental=incremental, streaming=streaming),
+        output_root=output_root,
+        max_concurrency=max_concurrency
+    ))
+
+    failed = [job for job in summary if job["status"] != "done"]
+    print(f"=== BATCH DONE: {len(summary) - len(failed)} succeeded, {len(failed)} failed ===")
+    print(f"Response cache: {get_response_cache().stats}")
+    print(f"LLM scheduler: {get_llm_scheduler().stats}")
+    return summary
+
+
+def main_worker(output_root="./output", max_concurrency=3, incremental=False, streaming=False, once=False):
+    """Consume the job queue in this process, building the clients, caches and LLMs once for every job"""
+    import asyncio
+    from job_queue import QueueWorker
+
+    queue = get_job_queue()
+    requeued = queue.requeue_stale(float(os.getenv("JOB_MAX_RUNTIME", str(2 * 3600))))
+    if requeued:
+        print(f"Requeued {requeued} jobs abandoned by a stopped worker")
+    # Warm up the shared clients and LLMs before the first job is claimed
+    init_agentops()
+    get_llms()
+    get_search_client()
+    get_scrape_client()
+    get_page_fetcher()
+    worker = QueueWorker(
+        queue,
+        lambda inputs, output_dir: make_crew(inputs, output_dir, incremental=incremental, streaming=streaming),
+        output_root=output_root,
+        max_concurrency=max_concurrency,
+        poll_interval=float(os.getenv("JOB_POLL_SECONDS", "2"))
+    )
+    try:
+        asyncio.run(worker.run(once=once))
+    except KeyboardInterrupt:
+        print("Worker interrupted; running jobs are requeued after JOB_MAX_RUNTIME")
+    print(f"Response cache: {get_response_cache().stats}")
+    print(f"LLM scheduler: {get_llm_scheduler().stats}")
+    return worker.processed
+
+
+def enqueue_jobs(jobs_path):
+    """Add every job of a JSONL/CSV file to the job queue; the queue gives each job a unique id"""
+    from batch_jobs import load_jobs
+
+    queue = get_job_queue()
+    job_ids = [queue.enqueue(job["inputs"]) for job in load_jobs(jobs_path)]
+    print(f"Queued {len(job_ids)} jobs: {', '.join(job_ids)}")
+    return job_ids
+
+
+def print_queue_status(limit=20):
+    queue = get_job_queue()
+    print(f"Job queue {queue.path}: {queue.stats}")
+    for job in queue.jobs(limit=limit):
+        timing = f"{job['run_seconds']:.1f}s" if "run_seconds" in job else ""
+        print(f"  {job['job_id']:<50} {job['status']:<8} {timing:>8} {job['error'] or ''}")
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Ohay procurement research crew")
+    parser.add_argument("--batch", help="JSONL or CSV file of jobs to run concurrently")
+    parser.add_argument("--output-root", default="./output", help="Parent directory of the per-job outputs, inside the current directory")
+    parser.add_argument("--max-concurrency", type=int, default=3, help="Maximum number of crews running at once")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Reuse the stored output of every step whose inputs and config did not change")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Scrape product pages while the remaining searches are still running")
+    parser.add_argument("--worker", action="store_true", help="Run as a long-lived worker consuming the job queue")
+    parser.add_argument("--once", action="store_true", help="With --worker, exit once the queue is empty")
+    parser.add_argument("--enqueue", help="JSONL or CSV file of jobs to add to the job queue")
+    parser.add_argument("--queue-status", action="store_true", help="Print the job queue counts, latencies and recent jobs")
+    parser.add_argument("--health", action="store_true", help="Exit right away without importing the heavy libraries")
+    parser.add_argument("--import-profile", action="store_true", help="Print the import-time breakdown and exit")
+    parser.add_argument("--startup-budget", type=float, default=None,
+                        help="With --import-profile, exit with an error when imports take longer than this many seconds")
+    args = parser.parse_args()
+
+    if args.health:
+        print("ok")
+    elif args.import_profile:
+        from startup import print_import_profile, profile_imports
+        sys.exit(0 if print_import_profile(profile_imports(), args.startup_budget) else 1)
+    elif args.enqueue or args.queue_status:
+        if args.enqueue:
+            enqueue_jobs(args.enqueue)
+        if args.queue_status:
+            print_queue_status()
+    elif args.worker:
+        main_worker(output_root=args.output_root, max_concurrency=args.max_concurrency,
+                    incremental=args.incremental, streaming=args.streaming, once=args.once)
+    elif args.batch:
+        main_batch(args.batch, output_root=args.output_root, max_concurrency=args.max_concurrency,
+                   incremental=args.incremental, streaming=args.streaming)
+    else:
+        main(incremental=args.incremental, streaming=args.streaming)
@@ -0,0 +1,72 @@
+from pydantic import ValidationError
+
+
+# Which model ("small" or "large") drives each agent. The revision task runs on the
+# author agent, so it follows the "author" entry.
+ROUTING_PROFILES = {
+    # Every agent but the query recommender on the large model (the original setup)
+    "quality": {"recommendation": "small", "search": "large", "scraping": "large", "author": "large", "critique": "large"},
+    # Tool-calling steps on the small model, writing and reviewing on the large one
+    "balanced": {"recommendation": "small", "search": "small", "scraping": "small", "author": "large", "critique": "large"},
+    # Everything on the small model
+    "fast": {"recommendation": "small", "search": "small", "scraping": "small", "author": "small", "critique": "small"},
+}
+
+AGENT_STEPS = {"revision": "author"}
+
+
+class ModelRouter:
+    """
+    Per-task model routing between a small and a large LLM.
+
+    `profile` is the name of one of ROUTING_PROFILES or a {step: "small" | "large"}
+    dict; missing steps use the large model. With `escalate`, a step on the small
+    model whose output fails schema validation is retried on the large model (see
+    `escalation_guardrail`); `escalations` lists the steps that were escalated.
+    """
+    def __init__(self, small_llm, large_llm, profile="quality", escalate=True):
+        if isinstance(profile, str):
+            if profile not in ROUTING_PROFILES:
+                raise ValueError(f"Unknown routing profile {profile!r}, expected one of {sorted(ROUTING_PROFILES)}")
+            self.profile_name, profile = profile, ROUTING_PROFILES[profile]
+        else:
+            self.profile_name = "custom"
+        self.profile = dict(profile)
+        self.llms = {"small": small_llm, "large": large_llm}
+        self.escalate = escalate
+        self.escalations = []
+
+    def tier(self, step):
+        return self.profile.get(AGENT_STEPS.get(step, step), "large")
+
+    def llm_for(self, step):
+        """Return the LLM that drives `step`"""
+        return self.llms[self.tier(step)]
+
+    def escalation_guardrail(self, step, agent, output_model):
+        """
+        Build a task guardrail validating the output against `output_model`.
+
+        When validation fails and the agent still runs on the small model, the agent is
+        switched to the large model before crewai retries the task. Returns None when
+        escalation is off.
+        """
+        if not self.escalate:
+            return None
+
+        def escalate_on_schema_failure(task_output):
+            try:
+                if task_output.json_dict is not None:
+                    output_model.model_validate(task_output.json_dict)
+                else:
+                    output_model.model_validate_json(task_output.raw)
+                return True, task_output
+            except (ValidationError, ValueError) as e:
+                error = f"The output does not match the {output_model.__name__} schema: {e}"
+            if agent.llm is not self.llms["large"]:
+                print(f"Escalating step '{step}' to {getattr(self.llms['large'], 'model', 'the large model')}")
+                agent.llm = self.llms["large"]
+                self.escalations.append(step)
+            return False, error
+
+        return escalate_on_schema_failure
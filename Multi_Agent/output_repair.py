@@ -0,0 +1,221 @@
+import ast
+import copy
+import json
+import re
+from typing import List, Union, get_args, get_origin
+
+from annotated_types import MaxLen, MinLen
+from pydantic import BaseModel, ValidationError
+from crewai.utilities.converter import Converter
+
+from web_scraping import PLACEHOLDER, SingleExtractedProduct, normalize_scraped_product, parse_number
+
+
+CODE_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+# Domain normalizers run on an item's dict before it is repaired against its model
+NORMALIZERS = {SingleExtractedProduct: normalize_scraped_product}
+# Values for required fields the LLM left out, the same ones ScrapingAgent._to_product sets
+DEFAULTS = {SingleExtractedProduct: {"agent_recommendation_rank": 0, "agent_recommendation_notes": []}}
+
+
+def _close_truncated(text):
+    """Close the strings, objects and arrays left open by a cut-off JSON document"""
+    stack, in_string, escaped = [], False, False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    text = re.sub(r'[,:]\s*$|,\s*"[^"]*"\s*$', "", text.rstrip())
+    return text + "".join(reversed(stack))
+
+
+def parse_lenient_json(text):
+    """
+    Parse the JSON an LLM returned, tolerating code fences, surrounding prose,
+    trailing commas, Python literals and a truncated end. Raises ValueError.
+    """
+    fenced = CODE_FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    start = min((i for i in (text.find("{"), text.find("[")) if i >= 0), default=-1)
+    if start < 0:
+        raise ValueError("No JSON object in the output")
+    text = text[start:]
+    end = max(text.rfind("}"), text.rfind("]"))
+    candidates = [text[:end + 1]] if end >= 0 else []
+    candidates.append(_close_truncated(text))
+    for candidate in candidates:
+        candidate = TRAILING_COMMA.sub(r"\1", candidate)
+        try:
+            return json.loads(candidate, strict=False)
+        except json.JSONDecodeError:
+            pass
+        try:
+            return ast.literal_eval(candidate)
+        except (ValueError, SyntaxError, MemoryError, RecursionError):
+            pass
+    raise ValueError("The output is not valid JSON")
+
+
+def _unwrap_optional(annotation):
+    if get_origin(annotation) is Union:
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        if len(args) == 1:
+            return args[0]
+    return annotation
+
+
+def _is_model(annotation):
+    return isinstance(annotation, type) and issubclass(annotation, BaseModel)
+
+
+class OutputRepairer:
+    """
+    Repairs parsed LLM output against a pydantic model without calling the LLM.
+
+    Numbers and currency strings are coerced with `parse_number`, scalars are turned
+    into strings or wrapped into lists where the schema wants them, empty optional
+    fields fall back to their defaults and required ones to `defaults`, lists are
+    truncated to their max length and lists of string-only models are padded to
+    their min length with placeholders. List items that still fail validation are
+    dropped. Every change is recorded in `report`.
+    """
+    def __init__(self, normalizers=None, defaults=None):
+        self.normalizers = NORMALIZERS if normalizers is None else normalizers
+        self.defaults = DEFAULTS if defaults is None else defaults
+        self.report = []
+
+    def _note(self, path, message):
+        self.report.append(f"{path or '<root>'}: {message}")
+
+    def _scalar(self, annotation, value, path):
+        if annotation in (float, int):
+            number = parse_number(value)
+            if number is None:
+                raise ValueError(f"{path}: {value!r} is not a number")
+            if annotation is int:
+                number = int(round(number))
+            if number != value:
+                self._note(path, f"coerced {value!r} to {number!r}")
+            return number
+        if annotation is str and isinstance(value, (int, float)) and not isinstance(value, bool):
+            self._note(path, f"coerced {value!r} to a string")
+            return str(value)
+        return value
+
+    def _list(self, field, item_annotation, value, path):
+        if not isinstance(value, list):
+            self._note(path, "wrapped the value in a list")
+            value = [value]
+        items = []
+        for index, item in enumerate(value):
+            try:
+                items.append(self._value(item_annotation, item, f"{path}[{index}]"))
+            except (ValueError, ValidationError) as e:
+                self._note(f"{path}[{index}]", f"dropped invalid item ({str(e).splitlines()[0]})")
+        bounds = {type(meta): meta for meta in (field.metadata if field else [])}
+        if MaxLen in bounds and len(items) > bounds[MaxLen].max_length:
+            self._note(path, f"truncated {len(items)} items to {bounds[MaxLen].max_length}")
+            items = items[:bounds[MaxLen].max_length]
+        if MinLen in bounds and len(items) < bounds[MinLen].min_length:
+            padding = self._placeholder(item_annotation)
+            if padding is None:
+                raise ValueError(f"{path}: fewer than {bounds[MinLen].min_length} valid items")
+            self._note(path, f"padded {len(items)} items to {bounds[MinLen].min_length} with {PLACEHOLDER!r} placeholders")
+            items += [padding] * (bounds[MinLen].min_length - len(items))
+        return items
+
+    @staticmethod
+    def _placeholder(annotation):
+        """A placeholder item for padding: only models made of required strings can be filled honestly"""
+        if annotation is str:
+            return PLACEHOLDER
+        if _is_model(annotation) and all(f.annotation is str for f in annotation.model_fields.values()):
+            return {name: PLACEHOLDER for name in annotation.model_fields}
+        return None
+
+    def _value(self, annotation, value, path, field=None):
+        annotation = _unwrap_optional(annotation)
+        if get_origin(annotation) in (list, List):
+            item_annotation = (get_args(annotation) or (str,))[0]
+            return self._list(field, _unwrap_optional(item_annotation), value, path)
+        if _is_model(annotation):
+            return self.repair(annotation, value, path)
+        return self._scalar(annotation, value, path)
+
+    def repair(self, model, data, path=""):
+        """Return `data` repaired into a dict that validates against `model`; raises ValueError/ValidationError"""
+        if not isinstance(data, dict):
+            fields = list(model.model_fields)
+            if isinstance(data, list) and len(fields) == 1:
+                self._note(path, f"wrapped the list in {{{fields[0]!r}: ...}}")
+                data = {fields[0]: data}
+            else:
+                raise ValueError(f"{path or model.__name__}: expected an object")
+        if model in self.normalizers:
+            data = self.normalizers[model](data)
+        repaired = {}
+        defaults = self.defaults.get(model, {})
+        for name, field in model.model_fields.items():
+            field_path = f"{path}.{name}" if path else name
+            value = data.get(name)
+            if value is None or (value == "" and field.annotation is not str):
+                if field.is_required() and name in defaults:
+                    value = copy.deepcopy(defaults[name])
+                    self._note(field_path, f"defaulted to {value!r}")
+                elif field.is_required() and get_origin(_unwrap_optional(field.annotation)) in (list, List):
+                    value = []
+                elif not field.is_required():
+                    continue
+                else:
+                    raise ValueError(f"{field_path} is missing")
+            repaired[name] = self._value(field.annotation, value, field_path, field)
+        return model.model_validate(repaired).model_dump(exclude_unset=True)
+
+    def repair_text(self, model, text):
+        """Parse and repair an LLM output text; returns the model instance"""
+        data = parse_lenient_json(text)
+        return model.model_validate(self.repair(model, data))
+
+
+class RepairingConverter(Converter):
+    """
+    crewai converter that repairs invalid structured output locally before asking the LLM.
+
+    crewai only reaches the converter once the task output failed to parse or validate
+    against `output_json`/`output_pydantic`; this tries OutputRepairer first and only
+    falls back to crewai's LLM conversion when the output cannot be repaired.
+    """
+    def _repair(self):
+        repairer = OutputRepairer()
+        try:
+            result = repairer.repair_text(self.model, self.text)
+        except (ValueError, ValidationError) as e:
+            print(f"Could not repair the {self.model.__name__} output locally ({str(e).splitlines()[0]}), asking the LLM")
+            return None
+        print(f"Repaired the {self.model.__name__} output locally with {len(repairer.report)} changes")
+        for change in repairer.report:
+            print(f"  - {change}")
+        return result
+
+    def to_pydantic(self, current_attempt=1):
+        result = self._repair() if current_attempt == 1 else None
+        return result if result is not None else super().to_pydantic(current_attempt)
+
+    def to_json(self, current_attempt=1):
+        result = self._repair() if current_attempt == 1 else None
+        return result.model_dump() if result is not None else super().to_json(current_attempt)
@@ -0,0 +1,166 @@
+"""
+Builds the Ohay procurement crew: search query recommendation, search, scraping,
+report author, critique and revision.
+
+- Model routing: a ModelRouter (or the name of a routing profile) picks the small or
+  large LLM per step and escalates search and scraping to the large one when their
+  output does not match the schema.
+- Memory and knowledge: both need an embedding provider (`embedder`, default OpenAI).
+  With a response cache every embedding is cached by text hash and unchanged
+  knowledge chunks are not embedded again; memory is off while `memoryless_steps` run.
+- `incremental`: steps whose inputs, config and upstream outputs did not change since
+  the last run in `output_dir` reuse their stored output.
+- `streaming`: the search and scraping agents are replaced by a code stage that starts
+  scraping as soon as the first search results arrive.
+- `price_store`: scraped products are recorded with their price, recently scraped
+  pages are not scraped again and the report shows price trends.
+- `page_fetcher`: amazon, jumia and noon pages are parsed locally from their
+  structured data, with smartscraper as the fallback.
+- Products are ranked in code (`ranking_weights` and `notes_top_k` inputs); the
+  scraping agent only writes notes for the top ones.
+- The critic reviews the report per section and up to `revision_rounds` rounds only
+  rewrite the flagged sections.
+"""
+from crewai import Process
+from crewai.knowledge.source.string_knowledge_source import StringKnowledgeSource
+
+from search_queries_recommendation import SearchQueryRecommender
+from search_engine import SearchEngine
+from search_filters import SearchResultFilter
+from web_scraping import ScrapingAgent
+from procurement_report_author import procurement_report_agent
+from procurement_report_critic import procurement_report_critic_agent
+from run_metrics import RunMetrics
+from checkpoints import ReplayedCrew, StepCheckpoints
+from streaming import StreamingCrew
+from model_routing import ModelRouter
+from guardrails import chain_guardrails
+from product_ranking import ProductRanker
+from output_repair import RepairingConverter
+from embedding_index import CachedEmbeddingFunction, MemoryScopedCrew, build_knowledge
+
+
+DEFAULT_INPUTS = {
+    "no_keywords": 10,
+    "score_th": 0.10,
+    "score_ra": 3.5
+}
+
+STEP_NAMES = ("recommendation", "search", "scraping", "author", "critique", "revision")
+
+# Tool-driven steps whose outputs reach the next step as task context anyway
+MEMORYLESS_STEPS = ("search", "scraping")
+
+ABOUT_COMPANY = "ohay is a company that provides AI solutions to help websites refine their search and recommendation systems."
+
+
+def build_crew(inputs, output_dir, llm, llm2, search_client=None, scrape_client=None, response_cache=None,
+               search_rate_limiter=None, scrape_rate_limiter=None, max_rpm=None, memory=True, knowledge=True,
+               incremental=False, streaming=False, revision_rounds=2, price_store=None, routing=None,
+               embedder=None, memoryless_steps=MEMORYLESS_STEPS, page_fetcher=None):
+    """
+    Build the Ohay procurement crew for one set of kickoff inputs, writing every output
+    file to `output_dir`. `llm`/`llm2` are the small and large models picked per step by
+    `routing`; clients, caches and rate limiters can be shared between crews. The
+    optional features are described at the top of this module.
+    """
+    metrics = RunMetrics(output_dir, step_names=STEP_NAMES)
+    router = routing if isinstance(routing, ModelRouter) else ModelRouter(llm, llm2, profile=routing or "quality")
+    search_recommender = SearchQueryRecommender(llm=router.llm_for("recommendation"), output_dir=output_dir)
+    result_filter = SearchResultFilter(
+        score_th=inputs.get("score_th"),
+        score_ra=inputs.get("score_ra"),
+        websites_list=inputs.get("websites_list")
+    )
+    search_engine = SearchEngine(llm=router.llm_for("search"), output_dir=output_dir, search_client=search_client,
+                                 rate_limiter=search_rate_limiter, cache=response_cache,
+                                 result_filter=result_filter, metrics=metrics)
+    web_scraping = ScrapingAgent(llm=router.llm_for("scraping"), output_dir=output_dir, scrape_client=scrape_client,
+                                 rate_limiter=scrape_rate_limiter, cache=response_cache, metrics=metrics,
+                                 price_store=price_store, country=inputs.get("country_name"),
+                                 category=inputs.get("product_name"), fetcher=page_fetcher)
+    procurement_report_author = procurement_report_agent(llm=router.llm_for("author"), output_dir=output_dir, price_store=price_store)
+    procurement_report_critic = procurement_report_critic_agent(llm=router.llm_for("critique"), output_dir=output_dir, max_rounds=revision_rounds)
+
+    #context_dependency
+    search_engine.set_context_dependency(search_recommender.get_task)
+    web_scraping.set_context_dependency(search_engine.get_task)
+    procurement_report_author.set_context_dependency(web_scraping.get_task)
+    procurement_report_critic.set_critique_context(procurement_report_author.get_task)
+    procurement_report_critic.set_revision_context(procurement_report_author.get_task,procurement_report_critic.get_critique_task,procurement_report_author.get_agent,
+                                                   renderer=procurement_report_author.renderer, products_task=web_scraping.get_task)
+
+    #model escalation on schema failures, then value-for-money ranking of the products
+    ranker = ProductRanker(weights=inputs.get("ranking_weights"), top_k=inputs.get("notes_top_k", 5))
+    for component, step, output_model, guardrail in (
+            (search_engine, "search", search_engine.AllSearchResults, None),
+            (web_scraping, "scraping", web_scraping.AllExtractedProducts,
+             ranker.guardrail(ratings_task=search_engine.get_task, write_notes=web_scraping.write_notes))):
+        component.get_task.guardrail = chain_guardrails(
+            router.escalation_guardrail(step, component.get_agent, output_model),
+            component.get_task.guardrail,
+            guardrail
+        )
+
+    #embeddings and knowledge_sources, kept in the local index between runs
+    if response_cache is not None and (memory or knowledge):
+        embedder = CachedEmbeddingFunction.from_config(embedder, response_cache).as_embedder()
+    crew_knowledge = None
+    if knowledge:
+        crew_knowledge = build_knowledge([StringKnowledgeSource(
+            content=ABOUT_COMPANY
+        )], embedder=embedder)
+
+    agents = [
+        search_recommender.get_agent,
+        search_engine.get_agent,
+        web_scraping.get_agent,
+        procurement_report_author.get_agent,
+        procurement_report_critic.get_agent
+    ]
+    metrics.agents = agents
+
+    tasks = [
+        search_recommender.get_task,
+        search_engine.get_task,
+        web_scraping.get_task,
+        procurement_report_author.get_task,
+        procurement_report_critic.get_critique_task,
+        procurement_report_critic.get_revision_task
+    ]
+    steps = list(zip(STEP_NAMES, tasks))
+    for step, task in steps:
+        task.name = step
+        if task.output_json or task.output_pydantic:
+            # Malformed structured output is repaired locally before crewai asks the LLM again
+            task.converter_cls = RepairingConverter
+
+    checkpoints = StepCheckpoints(output_dir, router=router)
+    if incremental:
+        steps = checkpoints.plan(steps, inputs)
+        if not steps:
+            print("Every step is up to date, replaying the stored outputs")
+            return ReplayedCrew(tasks)
+    for step, task in steps:
+        task.callback = lambda task_output, step=step, task=task: checkpoints.save(step, task, inputs, task_output)
+
+    crew_kwargs = dict(
+        agents=agents,
+        process=Process.sequential,
+        knowledge=crew_knowledge,
+        memory=memory,
+        embedder=embedder,
+        memoryless_tasks=list(memoryless_steps or []),
+        max_rpm=max_rpm,
+        task_callback=metrics.on_task_end
+    )
+    if streaming:
+        return StreamingCrew(steps, zip(STEP_NAMES, tasks), crew_kwargs, search_engine, web_scraping, metrics,
+                             crew_cls=MemoryScopedCrew)
+
+    return MemoryScopedCrew(
+        tasks=[task for _, task in steps],
+        before_kickoff_callbacks=[metrics.before_kickoff],
+        after_kickoff_callbacks=[metrics.after_kickoff],
+        **crew_kwargs
+    )
@@ -0,0 +1,185 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+
+from urls import canonicalize_url
+
+
+PRODUCT_COLUMNS = ("product_url", "page_url", "site", "country", "category", "product_title",
+                   "product_current_price", "product_original_price", "product_discount_percentage",
+                   "product_currency", "record", "first_seen", "last_scraped")
+# Columns added after the first release, created on stores that predate them
+ADDED_COLUMNS = {"products": {"product_currency": "TEXT"}, "price_history": {"currency": "TEXT"}}
+
+
+class PriceStore:
+    """
+    Local store of extracted products and their price history, kept in SQLite.
+
+    Products are keyed by canonical product url and indexed by site, country and
+    category; every scrape appends a timestamped price point to the history. The
+    store is shared between runs, so the scraper can skip recently scraped pages and
+    the report can show price trends without any network calls.
+    """
+    def __init__(self, path="./cache/prices.sqlite"):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS products (
+                product_url TEXT PRIMARY KEY,
+                page_url TEXT NOT NULL,
+                site TEXT NOT NULL,
+                country TEXT,
+                category TEXT,
+                product_title TEXT,
+                product_current_price REAL,
+                product_original_price REAL,
+                product_discount_percentage REAL,
+                product_currency TEXT,
+                record TEXT NOT NULL,
+                first_seen REAL NOT NULL,
+                last_scraped REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_products_page_url ON products (page_url);
+            CREATE INDEX IF NOT EXISTS idx_products_site ON products (site);
+            CREATE INDEX IF NOT EXISTS idx_products_country ON products (country);
+            CREATE INDEX IF NOT EXISTS idx_products_category ON products (category);
+            CREATE TABLE IF NOT EXISTS price_history (
+                product_url TEXT NOT NULL,
+                scraped_at REAL NOT NULL,
+                current_price REAL,
+                original_price REAL,
+                discount_percentage REAL,
+                currency TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_price_history_url ON price_history (product_url, scraped_at);
+        """)
+        for table, columns in ADDED_COLUMNS.items():
+            existing = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+            for column, column_type in columns.items():
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+        self._conn.commit()
+
+    @staticmethod
+    def key(url):
+        return canonicalize_url(url)
+
+    def record(self, product, country=None, category=None, scraped_at=None):
+        """Store a SingleExtractedProduct (or its dict) and append its price to the history"""
+        data = product.model_dump() if hasattr(product, "model_dump") else dict(product)
+        product_url = self.key(data.get("product_url") or data["page_url"])
+        scraped_at = scraped_at or time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO products (product_url, page_url, site, country, category, product_title,
+                    product_current_price, product_original_price, product_discount_percentage,
+                    product_currency, record, first_seen, last_scraped)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (product_url) DO UPDATE SET
+                    page_url = excluded.page_url,
+                    country = COALESCE(excluded.country, products.country),
+                    category = COALESCE(excluded.category, products.category),
+                    product_title = excluded.product_title,
+                    product_current_price = excluded.product_current_price,
+                    product_original_price = excluded.product_original_price,
+                    product_discount_percentage = excluded.product_discount_percentage,
+                    product_currency = excluded.product_currency,
+                    record = excluded.record,
+                    last_scraped = excluded.last_scraped
+                """,
+                (product_url, self.key(data["page_url"]), urlparse(product_url).netloc, country, category,
+                 data.get("product_title"), data.get("product_current_price"), data.get("product_original_price"),
+                 data.get("product_discount_percentage"), data.get("product_currency"), json.dumps(data),
+                 scraped_at, scraped_at)
+            )
+            self._conn.execute(
+                "INSERT INTO price_history (product_url, scraped_at, current_price, original_price, discount_percentage, "
+                "currency) VALUES (?, ?, ?, ?, ?, ?)",
+                (product_url, scraped_at, data.get("product_current_price"), data.get("product_original_price"),
+                 data.get("product_discount_percentage"), data.get("product_currency"))
+            )
+            self._conn.commit()
+
+    def recent(self, url, max_age):
+        """Return the stored product record for `url` if it was scraped less than `max_age` seconds ago"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT record, last_scraped FROM products WHERE product_url = ? OR page_url = ?",
+                (self.key(url), self.key(url))
+            ).fetchone()
+        if row is None or time.time() - row[1] > max_age:
+            return None
+        return json.loads(row[0])
+
+    def query(self, site=None, country=None, category=None, min_price=None, max_price=None, currency=None, limit=100):
+        """Return stored products matching every given filter, cheapest first"""
+        clauses, params = [], []
+        for column, value in (("site", site), ("country", country), ("category", category),
+                              ("product_currency", currency)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if min_price is not None:
+            clauses.append("product_current_price >= ?")
+            params.append(min_price)
+        if max_price is not None:
+            clauses.append("product_current_price <= ?")
+            params.append(max_price)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(PRODUCT_COLUMNS)} FROM products {where} "
+                "ORDER BY product_current_price IS NULL, product_current_price LIMIT ?",
+                (*params, limit)
+            ).fetchall()
+        return [{**dict(zip(PRODUCT_COLUMNS, row)), "record": json.loads(row[PRODUCT_COLUMNS.index("record")])}
+                for row in rows]
+
+    def history(self, url):
+        """Return the (scraped_at, current_price, original_price, discount_percentage, currency) points of a product"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT scraped_at, current_price, original_price, discount_percentage, currency FROM price_history "
+                "WHERE product_url = ? ORDER BY scraped_at",
+                (self.key(url),)
+            ).fetchall()
+
+    def price_trends(self, urls):
+        """
+        Summarize the price history of each url that has a stored price:
+        first and latest price, min, max, change in percent and number of points.
+        Only the points in the currency of the latest price are compared.
+        """
+        trends = {}
+        for url in urls:
+            points = [(at, price, currency) for at, price, _, _, currency in self.history(url) if price is not None]
+            if not points:
+                continue
+            currency = points[-1][2]
+            prices = [(at, price) for at, price, point_currency in points if point_currency in (currency, None)]
+            first, last = prices[0][1], prices[-1][1]
+            values = [price for _, price in prices]
+            trends[url] = {
+                "first_seen": prices[0][0],
+                "first_price": first,
+                "latest_price": last,
+                "min_price": min(values),
+                "max_price": max(values),
+                "change_percentage": round((last - first) / first * 100, 2) if first else None,
+                "points": len(prices),
+                "currency": currency
+            }
+        return trends
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -3,13 +3,27 @@
 
 
 from crewai import Agent, Task
+from typing import List
+from pydantic import BaseModel, Field
 import os
+from report_renderer import ReportRenderer
+
+
+class ReportNarrative(BaseModel):
+    executive_summary: str = Field(..., title="A brief overview of the procurement process and key findings")
+    introduction: str = Field(..., title="The purpose and scope of the report")
+    methodology: str = Field(..., title="How the prices were gathered and compared")
+    analysis: str = Field(..., title="Significant trends or observations in the findings")
+    recommendations: List[str] = Field(..., title="Procurement suggestions based on the analysis")
+    conclusion: str = Field(..., title="A summary of the report and final thoughts")
 
 
 class procurement_report_agent:
-    def __init__(self, llm, output_dir="./output"):
+    def __init__(self, llm, output_dir="./output", price_store=None):
         self.llm = llm
         self.output_dir = output_dir
+        self.renderer = ReportRenderer(output_dir=output_dir, price_store=price_store)
+        self.ReportNarrative = ReportNarrative
     
     
         # Create tool, agent and task
@@ -23,8 +37,8 @@ class procurement_report_agent:
         """Create the procurement Report Author Agent"""
         return Agent(
             role="Procurement Report Author Agent",
-            goal="To generate a professional HTML page for the procurement report",
-            backstory="The agent is designed to assist in generating a professional HTML page for the procurement report after looking into a list of products.",
+            goal="To write the narrative sections of a professional procurement report",
+            backstory="The agent is designed to assist in writing a professional procurement report after looking into a list of products. The report page, its tables and charts are rendered from the product data.",
             llm=self.llm,
             verbose=True,
 
@@ -34,28 +48,28 @@ class procurement_report_agent:
         """Create the scraping task"""
         return Task(
              description="\n".join([
-        "The task is to generate a professional HTML page for the procurement report.",
-        "You have to use Bootstrap CSS framework for a better UI.",
+        "The task is to write the narrative sections of a professional procurement report.",
         "Use the provided context about the OHAY company to make a specialized report.",
-        "The report will include the search results and prices of products from different websites.",
-        "The report should be structured with the following sections:",
+        "The report covers the search results and prices of products from different websites.",
+        "The Findings tables and charts and the Appendices raw data are generated from the product data, do not reproduce them.",
+        "Write only the following sections, each as plain text:",
         "1. Executive Summary: A brief overview of the procurement process and key findings.",
         "2. Introduction: An introduction to the purpose and scope of the report.",
         "3. Methodology: A description of the methods used to gather and compare prices.",
-        "4. Findings: Detailed comparison of prices from different websites, including tables and charts.",
-        "5. Analysis: An analysis of the findings, highlighting any significant trends or observations.",
-        "6. Recommendations: Suggestions for procurement based on the analysis.",
-        "7. Conclusion: A summary of the report and final thoughts.",
-        "8. Appendices: Any additional information, such as raw data or supplementary materials."
+        "4. Analysis: An analysis of the findings, highlighting any significant trends or observations.",
+        "5. Recommendations: Suggestions for procurement based on the analysis.",
+        "6. Conclusion: A summary of the report and final thoughts."
             ]),
-            expected_output="A professional HTML page for the procurement report.",
-            output_file=os.path.join(self.output_dir, "step_4_procurement_report.html"),
+            expected_output="A JSON object with the narrative sections of the procurement report.",
+            output_json=self.ReportNarrative,
+            output_file=os.path.join(self.output_dir, "step_4_report_narrative.json"),
             agent=self.agent
         )
     
     def set_context_dependency(self, dependency_task):
-        """Set context dependency for the task"""
+        """Set context dependency for the task; the report is rendered from its products"""
         self.task.context = [dependency_task]
+        self.task.guardrail = self.renderer.guardrail("step_4_procurement_report.html", dependency_task)
         return self
     
     
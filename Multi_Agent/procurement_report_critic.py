@@ -1,16 +1,142 @@
 import os
+import datetime
+import json
+import re
+from typing import Any, List, get_origin
+from pydantic import BaseModel, Field, PrivateAttr
 from crewai import Agent, Task
+from crewai.tasks.output_format import OutputFormat
+from crewai.tasks.task_output import TaskOutput
+from crewai.utilities.events import TaskCompletedEvent, TaskFailedEvent, TaskStartedEvent
+from crewai.utilities.events.crewai_event_bus import crewai_event_bus
+
+
+# A bullet or "1." / "1)" marker in front of a list item; "2 units of ..." keeps its number
+LIST_MARKER = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+")
+
+
+class SectionCritique(BaseModel):
+    section: str = Field(..., title="The key of the report section")
+    issues: List[str] = Field(..., title="Specific, actionable issues found in the section. Empty if none")
+    needs_revision: bool = Field(..., title="Whether the section has to be rewritten")
+
+class ReportCritique(BaseModel):
+    sections: List[SectionCritique]
+
+class SectionRevision(BaseModel):
+    section: str = Field(..., title="The key of the rewritten report section")
+    text: str = Field(..., title="The new text of the section. For recommendations, one recommendation per line")
+
+class SectionRevisions(BaseModel):
+    sections: List[SectionRevision]
+
+
+class SectionRevisionTask(Task):
+    """
+    Revision task that only regenerates the report sections flagged by the critique.
+
+    Each round the author rewrites the flagged sections, they are spliced into the
+    draft narrative and the critic reviews the result again, until nothing is flagged
+    or `max_rounds` rounds ran. When the critique flags nothing, the draft is kept
+    without any LLM call. When the guardrail rejects the result, every section is
+    rewritten with its error, up to `max_retries` times.
+    """
+    _critic: Any = PrivateAttr(default=None)
+
+    def execute_sync(self, agent=None, context=None, tools=None):
+        agent = agent or self.agent
+        self.agent = agent
+        self.start_time = datetime.datetime.now()
+        crewai_event_bus.emit(self, TaskStartedEvent(context=context, task=self))
+        try:
+            return self._finish(agent, self._revise(agent))
+        except Exception as e:
+            self.end_time = datetime.datetime.now()
+            crewai_event_bus.emit(self, TaskFailedEvent(error=str(e), task=self))
+            raise
+
+    def _rewrite(self, agent, narrative, flagged):
+        """Splice the author's rewrite of the flagged sections into the narrative"""
+        critic = self._critic
+        revisions = critic.rewrite_sections(agent, narrative, flagged, step=self.name)
+        for revision in revisions.get("sections", []):
+            if revision["section"] in flagged:
+                narrative[revision["section"]] = critic.section_value(revision["section"], revision["text"])
+        return narrative
+
+    def _revise(self, agent):
+        critic = self._critic
+        narrative = dict(self.context[0].output.json_dict or json.loads(self.context[0].output.raw))
+        critique = self.context[1].output.json_dict or json.loads(self.context[1].output.raw)
+
+        for round_number in range(1, critic.max_rounds + 1):
+            flagged = critic.flagged_sections(critique, narrative)
+            if not flagged:
+                print(f"Revision round {round_number}: no actionable issues, keeping the report")
+                break
+            print(f"Revision round {round_number}: rewriting {', '.join(flagged)}")
+            narrative = self._rewrite(agent, narrative, flagged)
+            if round_number < critic.max_rounds:
+                critique = critic.review(narrative, step=self.name)
+        return narrative
+
+    def _finish(self, agent, narrative):
+        """Check the spliced narrative with the guardrail and record it as this task's output, like Task.execute_sync does"""
+        while True:
+            task_output = TaskOutput(
+                name=self.name,
+                description=self.description,
+                expected_output=self.expected_output,
+                raw=json.dumps(narrative),
+                json_dict=narrative,
+                agent=agent.role,
+                output_format=OutputFormat.JSON
+            )
+            if not self.guardrail:
+                break
+            ok, result = self.guardrail(task_output)
+            if ok:
+                if isinstance(result, str):
+                    _, narrative = self._export_output(result)
+                    task_output.raw, task_output.json_dict = result, narrative
+                elif isinstance(result, TaskOutput):
+                    task_output = result
+                break
+            if self.retry_count >= self.max_retries:
+                raise Exception(f"Task failed guardrail validation after {self.max_retries} retries. Last error: {result}")
+            self.retry_count += 1
+            print(f"Guardrail blocked the revised report, rewriting it: {result}")
+            narrative = self._rewrite(agent, narrative, {section: [str(result)] for section in narrative})
+
+        self.output = task_output
+        self.end_time = datetime.datetime.now()
+        if self.callback:
+            self.callback(task_output)
+        crew = agent.crew
+        if crew and crew.task_callback and crew.task_callback != self.callback:
+            crew.task_callback(task_output)
+        if self.output_file:
+            self._save_file(task_output.json_dict or task_output.raw)
+        crewai_event_bus.emit(self, TaskCompletedEvent(output=task_output, task=self))
+        return task_output
+
 
 class procurement_report_critic_agent:
-    def __init__(self, llm, output_dir="./output"):
+    def __init__(self, llm, output_dir="./output", max_rounds=2):
         self.llm = llm
         self.output_dir = output_dir
+        self.max_rounds = max_rounds
+        self.ReportCritique = ReportCritique
+        self.SectionRevisions = SectionRevisions
         
         print(" Initializing procurement_report_critic_agent...")
         
         # Initialize context attributes FIRST
         self._critique_context = None
         self._revision_context = None
+        self._renderer = None
+        self._products_task = None
+        self._sections = []
         
         # Create agent and tasks
         self.agent = self._create_critic_agent()
@@ -43,11 +169,8 @@ class procurement_report_critic_agent:
             max_reasoning_attempts=3
         )
     
-    def _create_critique_task(self):
-        """Create the critique task"""
-        print(f"Creating critique task with context: {self._critique_context}")
-        return Task(
-            description="""Thoroughly review and critique the draft procurement report.
+    def _critique_description(self):
+        return """Thoroughly review and critique the draft procurement report.
                 
             Provide specific, constructive feedback on:
 
@@ -67,53 +190,108 @@ class procurement_report_critic_agent:
             - What sections need more depth?
             - Are there better alternatives not considered?
 
-            Provide detailed, specific feedback that the author can use to improve the report.""",
+            Provide detailed, specific feedback that the author can use to improve the report.
+
+            Structure the critique per report section, using the section keys of the report.
+            Only set needs_revision for a section when it has concrete issues the author can fix.""" + (
+            f"\nSection keys: {', '.join(self._sections)}" if self._sections else "")
+
+    def _create_critique_task(self):
+        """Create the critique task"""
+        print(f"Creating critique task with context: {self._critique_context}")
+        return Task(
+            description=self._critique_description(),
             agent=self.agent,
             context=self._critique_context,
-            expected_output="Detailed critique with specific improvement suggestions"
+            expected_output="A JSON object with the issues found in each report section",
+            output_json=self.ReportCritique
         )
-    
-    def _create_revision_task(self, author_agent):
-        """Create the revision task"""
-        print(f"Creating revision task with context: {self._revision_context}")
-        print(f"Author agent type: {type(author_agent)}")
-        
-        return Task(
-            description="""Revise and improve the procurement report based on the detailed critique provided.
-
-            Address all points raised in the critique:
-            - Fix any factual inaccuracies
-            - Fill identified information gaps
-            - Improve structure and clarity
-            - Strengthen recommendations
-            - Enhance executive summary
 
-            Ensure the final report is polished, comprehensive, and meets the highest quality standards.
-            Incorporate the feedback while maintaining your professional writing style.""",
+    def _create_section_revision_task(self, author_agent):
+        """Create the revision task that only rewrites the flagged sections"""
+        print(f"Creating section revision task with context: {self._revision_context}")
+        task = SectionRevisionTask(
+            description="Revise the procurement report by rewriting only the sections flagged in the critique, "
+                        f"in at most {self.max_rounds} critique/revision rounds.",
             agent=author_agent,
             context=self._revision_context,
-            expected_output="Final, polished procurement report",
-            output_file=os.path.join(self.output_dir, "step_4_updated_procurement_report.html")
+            expected_output="Final, polished procurement report narrative as a JSON object",
+            output_json=self._revision_context[0].output_json,
+            output_file=os.path.join(self.output_dir, "step_4_updated_report_narrative.json"),
+            guardrail=self._renderer.guardrail("step_4_updated_procurement_report.html", self._products_task)
+            if self._renderer else None
+        )
+        task._critic = self
+        return task
+
+    def flagged_sections(self, critique, narrative):
+        """Return {section: issues} for the sections of the narrative the critique wants rewritten"""
+        return {
+            item["section"]: item.get("issues") or []
+            for item in critique.get("sections", [])
+            if item.get("needs_revision") and item.get("section") in narrative
+        }
+
+    def section_value(self, section, text):
+        """Turn a rewritten section's text into the narrative field's type"""
+        annotation = self._revision_context[0].output_json.model_fields[section].annotation
+        if get_origin(annotation) in (list, List):
+            lines = [LIST_MARKER.sub("", line).strip() for line in text.splitlines()]
+            return [line for line in lines if line]
+        return text
+
+    def rewrite_sections(self, author_agent, narrative, flagged, step="revision"):
+        """Have the author rewrite the flagged sections; returns the SectionRevisions json"""
+        task = Task(
+            name=f"{step}.rewrite",
+            description="\n".join([
+                "Rewrite only the following sections of the procurement report narrative, fixing the listed issues:",
+                *[f"- {section}: {'; '.join(issues) or 'improve this section'}" for section, issues in flagged.items()],
+                "Keep the facts consistent with the other sections of the report given as context.",
+                "For recommendations, write one recommendation per line."
+            ]),
+            expected_output="A JSON object with the rewritten sections",
+            output_json=self.SectionRevisions,
+            agent=author_agent
+        )
+        output = task.execute_sync(context=json.dumps(narrative, indent=2))
+        return output.json_dict or json.loads(output.raw)
+
+    def review(self, narrative, step="revision"):
+        """Critique a revised narrative again; returns the ReportCritique json"""
+        task = Task(
+            name=f"{step}.review",
+            description=self._critique_description(),
+            expected_output="A JSON object with the issues found in each report section",
+            output_json=self.ReportCritique,
+            agent=self.agent
         )
+        output = task.execute_sync(context=json.dumps(narrative, indent=2))
+        return output.json_dict or json.loads(output.raw)
     
     def set_critique_context(self, author_task):
         """Set context dependency for critique task"""
         print(f"Setting critique context with: {type(author_task)}")
         self._critique_context = [author_task]
+        self._sections = list(author_task.output_json.model_fields) if author_task.output_json else []
         # Recreate the task with the updated context
         self.critique_task = self._create_critique_task()
         print("Critique context set successfully")
         return self
     
-    def set_revision_context(self, author_task, critique_task, author_agent):
-        """Set context dependency and create revision task"""
+    def set_revision_context(self, author_task, critique_task, author_agent, renderer=None, products_task=None):
+        """Set context dependency and create revision task; with a renderer the revised report is rendered from products_task"""
         print(f"Setting revision context with:")
         print(f"- Author task: {type(author_task)}")
         print(f"- Critique task: {type(critique_task)}")
         print(f"- Author agent: {type(author_agent)}")
         
+        if not author_task.output_json:
+            raise ValueError("The revision rewrites the sections of the author task's output_json, which is not set")
         self._revision_context = [author_task, critique_task]
-        self.revision_task = self._create_revision_task(author_agent)
+        self._renderer = renderer
+        self._products_task = products_task
+        self.revision_task = self._create_section_revision_task(author_agent)
         print("Revision context set successfully")
         return self
     
@@ -0,0 +1,135 @@
+import json
+
+import numpy as np
+
+from urls import canonicalize_url
+from web_scraping import listed_specs, parse_number
+
+
+DEFAULT_WEIGHTS = {"price": 0.4, "discount": 0.15, "rating": 0.25, "specs": 0.2}
+
+# Numeric specs where a smaller value is better; every other numeric spec counts higher as better
+LOWER_IS_BETTER_SPECS = ("weight", "noise", "consumption", "warm-up", "heating time")
+
+
+def _minmax(values):
+    """Scale a column to 0-1 ignoring NaNs; a constant column becomes 0.5"""
+    if np.isnan(values).all():
+        return values
+    low, high = np.nanmin(values), np.nanmax(values)
+    if high == low:
+        return np.where(np.isnan(values), np.nan, 0.5)
+    return (values - low) / (high - low)
+
+
+class ProductRanker:
+    """
+    Deterministic value-for-money ranking of extracted products, computed with NumPy.
+
+    Each product gets a 0-1 score per component: price (cheaper is better, compared
+    within the product's currency), discount, customer rating from the search results
+    and its numeric specs scaled against the other products that have the same spec.
+    The weighted mean of the available components is the product's `value_score`;
+    `agent_recommendation_rank` (1-5, higher is better) follows from it. Only the
+    `top_k` products get LLM-written notes.
+    """
+    def __init__(self, weights=None, top_k=5, lower_is_better=LOWER_IS_BETTER_SPECS):
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.top_k = top_k
+        self.lower_is_better = tuple(lower_is_better)
+
+    def _spec_scores(self, products):
+        names = sorted({
+            spec["specification_name"].strip().lower()
+            for product in products for spec in listed_specs(product.get("product_specs"))
+        })
+        if not names:
+            return np.full(len(products), np.nan)
+        matrix = np.full((len(products), len(names)), np.nan)
+        for row, product in enumerate(products):
+            for spec in listed_specs(product.get("product_specs")):
+                value = parse_number(spec.get("specification_value"))
+                if value is not None:
+                    matrix[row, names.index(spec["specification_name"].strip().lower())] = value
+        # Only specs that at least two products report numerically can be compared
+        comparable = np.sum(~np.isnan(matrix), axis=0) >= 2
+        if not comparable.any():
+            return np.full(len(products), np.nan)
+        matrix = matrix[:, comparable]
+        scaled = np.column_stack([_minmax(matrix[:, column]) for column in range(matrix.shape[1])])
+        flip = np.array([any(key in name for key in self.lower_is_better)
+                         for name, keep in zip(names, comparable) if keep])
+        scaled[:, flip] = 1 - scaled[:, flip]
+        with np.errstate(all="ignore"):
+            return np.nanmean(scaled, axis=1)
+
+    def score(self, products, ratings=None):
+        """Return the value score of every product dict (NaN-free, 0-1)"""
+        if not products:
+            return np.array([])
+        ratings = {canonicalize_url(url): rating for url, rating in (ratings or {}).items()}
+
+        def column(getter):
+            values = [getter(product) for product in products]
+            return np.array([np.nan if value is None else float(value) for value in values])
+
+        prices = column(lambda p: p.get("product_current_price"))
+        # Prices are only compared between products in the same currency
+        currencies = np.array([p.get("product_currency") or "" for p in products])
+        price_scores = np.full(len(products), np.nan)
+        for currency in np.unique(currencies):
+            same = currencies == currency
+            price_scores[same] = 1 - _minmax(prices[same])
+        discounts = column(lambda p: p.get("product_discount_percentage"))
+        customer_ratings = column(lambda p: ratings.get(canonicalize_url(p.get("page_url") or "")))
+
+        components = np.column_stack([
+            price_scores,
+            np.clip(discounts / 100, 0, 1),
+            np.clip(customer_ratings / 5, 0, 1),
+            self._spec_scores(products),
+        ])
+        weights = np.array([self.weights[name] for name in ("price", "discount", "rating", "specs")], dtype=float)
+        available = ~np.isnan(components)
+        weight_sums = (available * weights).sum(axis=1)
+        weighted = np.where(available, components, 0) @ weights
+        return np.divide(weighted, weight_sums, out=np.zeros(len(products)), where=weight_sums > 0)
+
+    def rank(self, products, ratings=None):
+        """Return copies of the product dicts, best first, with value_score and a 1-5 rank"""
+        scores = self.score(products, ratings)
+        if not len(scores):
+            return []
+        ranks = np.rint(1 + 4 * _minmax(scores)).astype(int)
+        order = np.argsort(-scores, kind="stable")
+        return [
+            {**products[i], "value_score": round(float(scores[i]), 4), "agent_recommendation_rank": int(ranks[i])}
+            for i in order
+        ]
+
+    def guardrail(self, ratings_task=None, write_notes=None):
+        """
+        Build a task guardrail that ranks the products of an AllExtractedProducts output.
+
+        Ratings are read from `ratings_task`'s AllSearchResult output. `write_notes(products)`
+        is called with the top_k products and returns {product_url: [notes]}; the notes
+        of every other product are cleared.
+        """
+        def rank_products(task_output):
+            data = task_output.json_dict or json.loads(task_output.raw)
+            ratings = {}
+            if ratings_task is not None and ratings_task.output is not None:
+                search = ratings_task.output.json_dict or json.loads(ratings_task.output.raw)
+                ratings = {r["url"]: r.get("rating") for r in search.get("results", []) if r.get("rating") is not None}
+
+            ranked = self.rank(data.get("products", []), ratings)
+            notes = write_notes(ranked[:self.top_k]) if write_notes and ranked else {}
+            for position, product in enumerate(ranked):
+                product["agent_recommendation_notes"] = (
+                    notes.get(product["product_url"], product.get("agent_recommendation_notes") or [])
+                    if position < self.top_k else []
+                )
+            print(f"Ranked {len(ranked)} products, notes for the top {min(self.top_k, len(ranked))}")
+            return True, json.dumps({**data, "products": ranked})
+
+        return rank_products
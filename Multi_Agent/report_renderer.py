@@ -0,0 +1,236 @@
+import json
+import os
+import time
+from html import escape
+from statistics import mean
+from urllib.parse import urlparse
+
+from web_scraping import listed_specs
+
+
+REPORT_SECTIONS = (
+    ("executive_summary", "Executive Summary"),
+    ("introduction", "Introduction"),
+    ("methodology", "Methodology"),
+    ("findings", "Findings"),
+    ("analysis", "Analysis"),
+    ("recommendations", "Recommendations"),
+    ("conclusion", "Conclusion"),
+    ("appendices", "Appendices"),
+)
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{title}</title>
+<link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/css/bootstrap.min.css" rel="stylesheet">
+<script src="https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.min.js"></script>
+</head>
+<body class="bg-light">
+<div class="container my-5">
+<h1 class="mb-4">{title}</h1>
+{sections}
+</div>
+<script>
+{scripts}
+</script>
+</body>
+</html>
+"""
+
+CHART_SCRIPT = """new Chart(document.getElementById("{canvas_id}"), {{
+  type: "bar",
+  data: {data},
+  options: {{responsive: true, plugins: {{legend: {{display: {legend}}}}}}}
+}});"""
+
+
+def _site(product):
+    return urlparse(product.get("product_url") or product.get("page_url") or "").netloc or "unknown"
+
+
+def _price(value, currency=None):
+    return "-" if value is None else f"{value:,.2f}" + (f" {currency}" if currency else "")
+
+
+def _table(headers, rows):
+    head = "".join(f"<th>{escape(str(header))}</th>" for header in headers)
+    body = "".join("<tr>" + "".join(f"<td>{cell}</td>" for cell in row) + "</tr>" for row in rows)
+    return (
+        '<div class="table-responsive"><table class="table table-striped table-bordered table-sm">'
+        f"<thead class=\"table-dark\"><tr>{head}</tr></thead><tbody>{body}</tbody></table></div>"
+    )
+
+
+def _paragraphs(text):
+    return "".join(f"<p>{escape(block.strip())}</p>" for block in str(text or "").split("\n\n") if block.strip())
+
+
+class ReportRenderer:
+    """
+    Renders the procurement report HTML from the scraped products and the narrative
+    written by the author agent.
+
+    The Findings tables and charts and the Appendices raw data are built directly
+    from `AllExtractedProducts`; the LLM only supplies the `ReportNarrative` text
+    sections, so its output stays small. With a `price_store`, Findings also shows
+    the stored price history of the products.
+    """
+    def __init__(self, output_dir="./output", title="Procurement Report", price_store=None):
+        self.output_dir = output_dir
+        self.title = title
+        self.price_store = price_store
+
+    def _price_trends(self, products):
+        """Return the price history table html, or an empty string without history"""
+        if self.price_store is None:
+            return ""
+        urls = {p.get("product_url") or p.get("page_url"): p for p in products}
+        trends = self.price_store.price_trends(urls)
+        rows = [
+            [
+                escape(urls[url].get("product_title") or ""),
+                time.strftime("%Y-%m-%d", time.localtime(trend["first_seen"])),
+                _price(trend["first_price"], trend.get("currency")),
+                _price(trend["latest_price"], trend.get("currency")),
+                _price(trend["min_price"], trend.get("currency")),
+                _price(trend["max_price"], trend.get("currency")),
+                "-" if trend["change_percentage"] is None else f'{trend["change_percentage"]:+.1f}%',
+                trend["points"]
+            ]
+            for url, trend in trends.items() if trend["points"] > 1
+        ]
+        if not rows:
+            return ""
+        return "<h4>Price history</h4>" + _table(
+            ["Product", "First seen", "First price", "Latest price", "Lowest", "Highest", "Change", "Observations"], rows
+        )
+
+    def _findings(self, products):
+        """Return the Findings section html and its chart scripts"""
+        if not products:
+            return "<p>No products were extracted.</p>", []
+
+        # Prices are summarized per website and currency, never across currencies
+        by_site = {}
+        for product in products:
+            currency = product.get("product_currency")
+            by_site.setdefault(_site(product) + (f" ({currency})" if currency else ""), []).append(product)
+
+        site_stats = []
+        for site, site_products in sorted(by_site.items()):
+            prices = [p["product_current_price"] for p in site_products if p.get("product_current_price") is not None]
+            site_stats.append((site, len(site_products), min(prices, default=None),
+                               mean(prices) if prices else None, max(prices, default=None)))
+        site_rows = [[escape(site), count] + [_price(value) for value in values]
+                     for site, count, *values in site_stats]
+
+        ranked = sorted(products, key=lambda p: (-(p.get("agent_recommendation_rank") or 0),
+                                                 -(p.get("value_score") or 0),
+                                                 p.get("product_current_price") or 0))
+        comparison_rows = [
+            [
+                f'<a href="{escape(p.get("product_url") or p.get("page_url") or "")}">{escape(p.get("product_title") or "")}</a>',
+                escape(_site(p)),
+                _price(p.get("product_current_price"), p.get("product_currency")),
+                _price(p.get("product_original_price"), p.get("product_currency")),
+                "-" if p.get("product_discount_percentage") is None else f'{p["product_discount_percentage"]:.0f}%',
+                p.get("agent_recommendation_rank") or "-",
+                "-" if p.get("value_score") is None else f'{p["value_score"]:.2f}'
+            ]
+            for p in ranked
+        ]
+
+        charts = [
+            ("price-by-product", {
+                "labels": [(p.get("product_title") or "")[:40] for p in ranked],
+                "datasets": [{"label": "Current price", "data": [p.get("product_current_price") for p in ranked]}]
+            }, False),
+            ("price-by-site", {
+                "labels": [stats[0] for stats in site_stats],
+                "datasets": [
+                    {"label": label, "data": [stats[index] for stats in site_stats]}
+                    for label, index in (("Min price", 2), ("Average price", 3), ("Max price", 4))
+                ]
+            }, True),
+        ]
+
+        html = "".join([
+            "<h4>Price summary by website</h4>",
+            _table(["Website", "Products", "Min price", "Average price", "Max price"], site_rows),
+            '<canvas id="price-by-site" class="my-4"></canvas>',
+            "<h4>Product comparison</h4>",
+            _table(["Product", "Website", "Current price", "Original price", "Discount", "Rank", "Value score"], comparison_rows),
+            '<canvas id="price-by-product" class="my-4"></canvas>',
+            self._price_trends(products),
+        ])
+        scripts = [
+            CHART_SCRIPT.format(canvas_id=canvas_id, data=json.dumps(data).replace("</", "<\\/"), legend=json.dumps(legend))
+            for canvas_id, data, legend in charts
+        ]
+        return html, scripts
+
+    def _appendices(self, products):
+        rows = [
+            [
+                escape(p.get("product_title") or ""),
+                escape(p.get("page_url") or ""),
+                "<br>".join(
+                    f'{escape(spec.get("specification_name", ""))}: {escape(spec.get("specification_value", ""))}'
+                    for spec in listed_specs(p.get("product_specs"))
+                ),
+                "<br>".join(escape(note) for note in p.get("agent_recommendation_notes") or [])
+            ]
+            for p in products
+        ]
+        return "".join([
+            "<h4>Raw product data</h4>",
+            _table(["Product", "Page url", "Specifications", "Notes"], rows),
+            '<details><summary>JSON</summary><pre class="bg-white border p-3">',
+            escape(json.dumps(products, indent=2, ensure_ascii=False)),
+            "</pre></details>",
+        ])
+
+    def render(self, narrative, products):
+        """Return the full report html for a narrative dict and a list of product dicts"""
+        findings, scripts = self._findings(products)
+        bodies = {key: _paragraphs(narrative.get(key)) for key, _ in REPORT_SECTIONS}
+        bodies["findings"] = findings
+        bodies["recommendations"] = "<ol>" + "".join(
+            f"<li>{escape(str(item))}</li>" for item in narrative.get("recommendations") or []
+        ) + "</ol>"
+        bodies["appendices"] = self._appendices(products)
+
+        sections = "\n".join(
+            f'<section class="card mb-4"><div class="card-body"><h2 class="card-title">{number}. {heading}</h2>'
+            f"{bodies[key]}</div></section>"
+            for number, (key, heading) in enumerate(REPORT_SECTIONS, start=1)
+        )
+        return PAGE_TEMPLATE.format(title=escape(self.title), sections=sections, scripts="\n".join(scripts))
+
+    def write(self, filename, narrative, products):
+        path = os.path.join(self.output_dir, filename)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.render(narrative, products))
+        print(f"Rendered report to {path}")
+        return path
+
+    def guardrail(self, filename, products_task):
+        """
+        Build a task guardrail that renders the report once the task returns a valid
+        narrative. Products are read from `products_task`'s output at render time.
+        """
+        def render_report(task_output):
+            narrative = task_output.json_dict
+            if not narrative:
+                return False, "Return only the JSON object of the report narrative sections."
+            products_output = products_task.output
+            products = []
+            if products_output is not None:
+                products = (products_output.json_dict or json.loads(products_output.raw)).get("products", [])
+            self.write(filename, narrative, products)
+            return True, task_output
+        return render_report
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+
+class ResponseCache:
+    """
+    Persistent, content-addressed cache of JSON responses stored in SQLite.
+
+    Entries are grouped by namespace (e.g. "search", "scrape"), each with its own TTL
+    in seconds (None means the entry never expires). Values are stored as
+    zlib-compressed JSON and the least recently used entries are evicted once the
+    total stored size goes over `max_bytes`.
+    """
+    def __init__(self, path="./cache/responses.sqlite", ttls=None, default_ttl=24 * 3600,
+                 max_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.hits = {}
+        self.misses = {}
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries (last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(namespace, *parts):
+        """Build the content address of an entry from its namespace and key parts"""
+        raw = json.dumps([namespace, *parts], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _ttl(self, namespace):
+        return self.ttls.get(namespace, self.default_ttl)
+
+    def get(self, namespace, *parts):
+        """Return the cached value for the key parts, or None on a miss or expired entry"""
+        key = self.make_key(namespace, *parts)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            ttl = self._ttl(namespace)
+            if row is None or (ttl is not None and now - row[1] > ttl):
+                if row is not None:
+                    self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses[namespace] = self.misses.get(namespace, 0) + 1
+                return None
+            self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits[namespace] = self.hits.get(namespace, 0) + 1
+        return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+
+    def set(self, namespace, value, *parts):
+        """Store a JSON-serializable value under the key parts"""
+        key = self.make_key(namespace, *parts)
+        blob = zlib.compress(json.dumps(value, default=str).encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, namespace, value, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, namespace, blob, len(blob), now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM entries ORDER BY last_access ASC"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+
+    def get_or_compute(self, namespace, parts, compute, should_cache=None):
+        """Return the cached value for `parts`, calling `compute()` and storing its result on a miss"""
+        value = self.get(namespace, *parts)
+        if value is not None:
+            return value
+        value = compute()
+        if should_cache is None or should_cache(value):
+            self.set(namespace, value, *parts)
+        return value
+
+    @property
+    def stats(self):
+        """Hit and miss counters per namespace"""
+        namespaces = set(self.hits) | set(self.misses)
+        return {
+            namespace: {"hits": self.hits.get(namespace, 0), "misses": self.misses.get(namespace, 0)}
+            for namespace in sorted(namespaces)
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,148 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+TOKEN_FIELDS = ("total_tokens", "prompt_tokens", "completion_tokens", "successful_requests")
+
+
+class RunMetrics:
+    """
+    Local, offline instrumentation of a crew run.
+
+    Records per-task wall time, LLM request and token counts (from the agents' token
+    counters) and the count and latency of tool and provider calls made while each
+    task was running. Hook it into a Crew through `before_kickoff`, `on_task_end`
+    and `after_kickoff`; the report is written to `run_metrics.json` and
+    `run_metrics.txt` in `output_dir`.
+    """
+    def __init__(self, output_dir, agents=(), step_names=()):
+        self.output_dir = output_dir
+        self.agents = list(agents)
+        self.step_names = list(step_names)
+        self.tasks = []
+        self._lock = threading.Lock()
+        self._pending_calls = {}
+        self._run_start = None
+        self._task_start = None
+        self._last_tokens = None
+
+    def _token_totals(self):
+        totals = dict.fromkeys(TOKEN_FIELDS, 0)
+        for agent in self.agents:
+            token_process = getattr(agent, "_token_process", None)
+            if token_process is None:
+                continue
+            summary = token_process.get_summary()
+            for field in TOKEN_FIELDS:
+                totals[field] += getattr(summary, field, 0) or 0
+        return totals
+
+    def before_kickoff(self, inputs):
+        """Crew before_kickoff callback: start the run clock"""
+        self._run_start = self._task_start = time.perf_counter()
+        self._last_tokens = self._token_totals()
+        return inputs
+
+    @contextmanager
+    def timed(self, kind, name):
+        """Time a tool or provider call and attribute it to the task currently running"""
+        started = time.perf_counter()
+        ok = True
+        try:
+            yield
+        except Exception:
+            ok = False
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                stats = self._pending_calls.setdefault(
+                    (kind, name), {"calls": 0, "errors": 0, "seconds": 0.0, "max_seconds": 0.0}
+                )
+                stats["calls"] += 1
+                stats["errors"] += 0 if ok else 1
+                stats["seconds"] += elapsed
+                stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+
+    def on_task_end(self, task_output):
+        """Crew task_callback: close the current task's measurements"""
+        if "." in (getattr(task_output, "name", None) or ""):
+            # Sub-task run inside a step ("revision.rewrite"); it is counted in that step
+            return
+        now = time.perf_counter()
+        if self._run_start is None:
+            self.before_kickoff(None)
+        tokens = self._token_totals()
+        with self._lock:
+            calls, self._pending_calls = self._pending_calls, {}
+        index = len(self.tasks)
+        self.tasks.append({
+            "step": getattr(task_output, "name", None) or (
+                self.step_names[index] if index < len(self.step_names) else f"task_{index + 1}"
+            ),
+            "agent": getattr(task_output, "agent", None),
+            "seconds": round(now - self._task_start, 3),
+            "llm_requests": tokens["successful_requests"] - self._last_tokens["successful_requests"],
+            "prompt_tokens": tokens["prompt_tokens"] - self._last_tokens["prompt_tokens"],
+            "completion_tokens": tokens["completion_tokens"] - self._last_tokens["completion_tokens"],
+            "calls": [
+                {"kind": kind, "name": name, **{k: round(v, 3) if isinstance(v, float) else v for k, v in stats.items()}}
+                for (kind, name), stats in sorted(calls.items())
+            ]
+        })
+        self._task_start = now
+        self._last_tokens = tokens
+
+    def after_kickoff(self, result):
+        """Crew after_kickoff callback: write the report"""
+        self.write()
+        return result
+
+    def report(self):
+        total_seconds = time.perf_counter() - self._run_start if self._run_start else 0.0
+        return {
+            "total_seconds": round(total_seconds, 3),
+            "llm_requests": sum(task["llm_requests"] for task in self.tasks),
+            "prompt_tokens": sum(task["prompt_tokens"] for task in self.tasks),
+            "completion_tokens": sum(task["completion_tokens"] for task in self.tasks),
+            "tasks": self.tasks
+        }
+
+    def summary_table(self, report=None):
+        report = report or self.report()
+        header = f"{'step':<16}{'seconds':>10}{'llm req':>9}{'prompt tok':>12}{'compl tok':>11}{'tool calls':>12}{'tool secs':>11}"
+        lines = [header, "-" * len(header)]
+        for task in report["tasks"]:
+            tool_calls = sum(call["calls"] for call in task["calls"])
+            tool_seconds = sum(call["seconds"] for call in task["calls"])
+            lines.append(
+                f"{task['step']:<16}{task['seconds']:>10.2f}{task['llm_requests']:>9}"
+                f"{task['prompt_tokens']:>12}{task['completion_tokens']:>11}{tool_calls:>12}{tool_seconds:>11.2f}"
+            )
+        lines.append("-" * len(header))
+        lines.append(
+            f"{'total':<16}{report['total_seconds']:>10.2f}{report['llm_requests']:>9}"
+            f"{report['prompt_tokens']:>12}{report['completion_tokens']:>11}"
+        )
+        return "\n".join(lines)
+
+    def write(self):
+        report = self.report()
+        table = self.summary_table(report)
+        os.makedirs(self.output_dir, exist_ok=True)
+        with open(os.path.join(self.output_dir, "run_metrics.json"), "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        with open(os.path.join(self.output_dir, "run_metrics.txt"), "w", encoding="utf-8") as f:
+            f.write(table + "\n")
+        print(table)
+        return report
+
+
+class NullMetrics:
+    """Stand-in used when a component runs without RunMetrics"""
+    @contextmanager
+    def timed(self, kind, name):
+        yield
@@ -1,8 +1,11 @@
 from crewai import Agent, Task
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional
 from crewai.tools import tool
 import os 
+from concurrency import HostRateLimiter, run_concurrently
+from urls import normalize_query
+from run_metrics import NullMetrics
 
 
 
@@ -13,7 +16,7 @@ class SignleSearchResult(BaseModel):
     url: str = Field(..., title="the page url")
     content: str
     score: float
-    rating : float
+    rating : Optional[float] = Field(None, title="the customer rating out of 5, if the page shows one")
     search_query: str
     
 class AllSearchResult(BaseModel):
@@ -21,10 +24,18 @@ class AllSearchResult(BaseModel):
 
 
 class SearchEngine:
-    def __init__(self, llm, output_dir="./output",search_client=None):
+    search_host = "api.tavily.com"
+
+    def __init__(self, llm, output_dir="./output",search_client=None, max_concurrency=5, rate_limiter=None,
+                 cache=None, result_filter=None, metrics=None):
         self.llm = llm
         self.output_dir = output_dir
         self.search_client = search_client
+        self.max_concurrency = max_concurrency
+        self.rate_limiter = rate_limiter or HostRateLimiter()
+        self.cache = cache
+        self.result_filter = result_filter
+        self.metrics = metrics or NullMetrics()
         
         # Define models
         self.SingleSearchResult = SignleSearchResult
@@ -32,6 +43,7 @@ class SearchEngine:
         
         # Create tool, agent and task
         self.search_tool = self._create_search_tool()
+        self.batch_search_tool = self._create_batch_search_tool()
         self.agent = self._create_agent()
         self.task = self._create_task()
                  
@@ -43,13 +55,70 @@ class SearchEngine:
         def search_engine_tool(query: str):
             """Useful for search-based queries. Use this to find current information about any query related pages using a search engine"""
             if self.search_client:
-                return self.search_client.search(query)
+                with self.metrics.timed("tool", "search_engine_tool"):
+                    response = self._search(query)
+                    if self.result_filter is None:
+                        return response
+                    return self._filter([{**result, "search_query": query} for result in response.get("results", [])])
             else:
                 # Fallback or mock implementation
                 return f"Search results for: {query}"
         
         return search_engine_tool
 
+    def _create_batch_search_tool(self):
+        """Create the batch search tool that runs every suggested query in one call"""
+        @tool
+        def batch_search_engine_tool(queries: List[str]):
+            """Run all the suggested search queries at once and return the merged results. Prefer this over calling search_engine_tool once per query."""
+            if self.search_client:
+                with self.metrics.timed("tool", "batch_search_engine_tool"):
+                    return self.search_queries(queries)
+            else:
+                # Fallback or mock implementation
+                return {"results": [f"Search results for: {query}" for query in queries], "failed_queries": []}
+
+        return batch_search_engine_tool
+
+    def _search(self, query):
+        """Run a single query against the search client, respecting the rate limit and the response cache"""
+        def _call():
+            self.rate_limiter.wait(self.search_host)
+            with self.metrics.timed("provider", "tavily.search"):
+                return self.search_client.search(query)
+
+        if self.cache is None:
+            return _call()
+        return self.cache.get_or_compute("search", [normalize_query(query)], _call)
+
+    def search_queries(self, queries):
+        """
+        Run all queries concurrently and merge their results, tagging each result with its query.
+
+        With a result_filter the merged results are filtered in code and returned as an
+        AllSearchResult-shaped dict, so the agent never sees the raw search payload.
+        """
+        unique_queries = list(dict.fromkeys(q.strip() for q in queries if q and q.strip()))
+        results, failed_queries = [], []
+        for query, response, error in run_concurrently(self._search, unique_queries, self.max_concurrency):
+            if error is not None:
+                failed_queries.append({"query": query, "error": str(error)})
+                continue
+            for result in response.get("results", []):
+                results.append({**result, "search_query": query})
+
+        if self.result_filter is not None:
+            results = self._filter(results)["results"]
+        return {"results": results, "failed_queries": failed_queries}
+
+    def _filter(self, raw_results):
+        """Apply the result filter and validate what is left as an AllSearchResult"""
+        kept = self.result_filter.apply(raw_results)
+        print(f"Search result filter: {self.result_filter.stats}")
+        return self.AllSearchResults(
+            results=[self.SingleSearchResult(**result) for result in kept]
+        ).model_dump()
+
     def _create_agent(self):
         """Create the search engine agent"""
         return Agent(
@@ -58,7 +127,7 @@ class SearchEngine:
             backstory="The agent is designed to help in looking for products by searching for products based on the suggested search queries.",
             llm=self.llm,
             verbose=True,
-            tools=[self.search_tool]
+            tools=[self.batch_search_tool, self.search_tool]
         )
     
     def _create_task(self):
@@ -67,8 +136,10 @@ class SearchEngine:
             description="\n".join([
                 "The task is to search for products based on the suggested search queries.",
                 "You have to collect results from multiple search queries.",
+                "Pass all the suggested search queries to batch_search_engine_tool in a single call.",
                 "Ignore any suspicious links or not an ecommerce single product website link.",
                 "Ignore any search results with confidence score less than ({score_th}) and a customer rating (score) lower than ({score_ra})",
+                "The search tools already drop results that break these rules, so keep the results they return unless they are clearly irrelevant.",
                 "The search results will be used to compare prices of products from different websites.",
             ]),
             expected_output="A JSON object containing the search results.",
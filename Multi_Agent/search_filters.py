@@ -0,0 +1,167 @@
+import re
+from urllib.parse import urlparse
+
+from urls import canonicalize_url, product_id, title_similarity
+
+
+# Product detail page patterns for the stores we usually target
+PRODUCT_URL_PATTERNS = {
+    "amazon.": re.compile(r"/(dp|gp/product)/[A-Z0-9]{10}", re.IGNORECASE),
+    "noon.com": re.compile(r"/[A-Z0-9]{10,}/p(/|$)", re.IGNORECASE),
+    "jumia.": re.compile(r"-\d+\.html$", re.IGNORECASE),
+}
+
+# Paths that point at listings, searches or editorial content rather than a single product
+NON_PRODUCT_PATH = re.compile(
+    r"/(s|search|category|categories|catalog|c|b|blog|blogs|list|lists|collections|deals|brand|stores?)(/|$)",
+    re.IGNORECASE
+)
+NON_PRODUCT_QUERY_KEYS = {"k", "q", "query", "keyword", "keywords", "search"}
+
+RATING_PATTERN = re.compile(
+    r"(\d(?:[.,]\d)?)\s*(?:out of\s*5|/\s*5|stars?|من\s*5)",
+    re.IGNORECASE
+)
+
+
+def _strip_www(host):
+    return host[4:] if host.startswith("www.") else host
+
+
+def extract_rating(text):
+    """Pull a 0-5 customer rating out of a search snippet, or None if it has none"""
+    match = RATING_PATTERN.search(text or "")
+    if not match:
+        return None
+    rating = float(match.group(1).replace(",", "."))
+    return rating if 0 <= rating <= 5 else None
+
+
+class ProductDeduplicator:
+    """
+    Collapses search results that point at the same product before they are scraped.
+
+    A result is a duplicate when its canonical url or its site product id (amazon
+    ASIN, noon SKU, jumia id) was already seen, or when its title is at least
+    `title_threshold` similar to a kept title on the same site. `stats` counts the
+    duplicates per reason, i.e. the scrapes avoided.
+    """
+    def __init__(self, title_threshold=0.97):
+        self.title_threshold = title_threshold
+        self.stats = {}
+        self._urls = set()
+        self._product_ids = set()
+        self._titles = {}
+
+    def check(self, url, title=None):
+        """Return the duplicate reason for a result, or None after registering it as new"""
+        canonical = canonicalize_url(url)
+        key = product_id(url)
+        site = urlparse(canonical).netloc
+        if canonical in self._urls:
+            reason = "duplicate_url"
+        elif key is not None and key in self._product_ids:
+            reason = "duplicate_product_id"
+        elif title and any(title_similarity(title, seen) >= self.title_threshold for seen in self._titles.get(site, [])):
+            reason = "similar_title"
+        else:
+            self._urls.add(canonical)
+            if key is not None:
+                self._product_ids.add(key)
+            if title:
+                self._titles.setdefault(site, []).append(title)
+            return None
+        self.stats[reason] = self.stats.get(reason, 0) + 1
+        return reason
+
+    @property
+    def scrapes_avoided(self):
+        return sum(self.stats.values())
+
+
+class SearchResultFilter:
+    """
+    Deterministic filter applied to raw search results before they reach the LLM.
+
+    Drops results under the score threshold or with a known customer rating under
+    the rating threshold, results outside `websites_list`, urls that do not look like a
+    single product page, and duplicates of the same product (see ProductDeduplicator).
+    Kept urls are canonicalized. `stats` counts why results were dropped.
+    """
+    def __init__(self, score_th=None, score_ra=None, websites_list=None):
+        self.score_th = score_th
+        self.score_ra = score_ra
+        self.allowed_sites = [self._parse_site(site) for site in (websites_list or [])]
+        self.stats = {}
+
+    @staticmethod
+    def _parse_site(site):
+        parsed = urlparse(site if "//" in site else f"//{site}")
+        return _strip_www(parsed.netloc.lower()), parsed.path.rstrip("/")
+
+    def _count(self, reason):
+        self.stats[reason] = self.stats.get(reason, 0) + 1
+
+    def is_allowed_site(self, url):
+        if not self.allowed_sites:
+            return True
+        parsed = urlparse(url)
+        host = _strip_www(parsed.netloc.lower())
+        for allowed_host, allowed_path in self.allowed_sites:
+            if (host == allowed_host or host.endswith("." + allowed_host)) and parsed.path.startswith(allowed_path):
+                return True
+        return False
+
+    @staticmethod
+    def is_product_page(url):
+        parsed = urlparse(url)
+        host = parsed.netloc.lower()
+        for site, pattern in PRODUCT_URL_PATTERNS.items():
+            if site in host:
+                return bool(pattern.search(parsed.path))
+        if NON_PRODUCT_PATH.search(parsed.path) or parsed.path in ("", "/"):
+            return False
+        query_keys = {pair.split("=", 1)[0].lower() for pair in parsed.query.split("&") if pair}
+        return not (query_keys & NON_PRODUCT_QUERY_KEYS)
+
+    def apply(self, results, deduplicator=None):
+        """
+        Filter raw search results (dicts with title, url, content, score and search_query).
+
+        Returns the kept results as dicts matching SignleSearchResult. Pass a shared
+        `deduplicator` to collapse duplicates across several calls.
+        """
+        deduplicator = deduplicator or ProductDeduplicator()
+        kept = []
+        for result in results:
+            url = result.get("url") or ""
+            score = float(result.get("score") or 0.0)
+            rating = result.get("rating")
+            if rating is None:
+                rating = extract_rating(f"{result.get('title', '')} {result.get('content', '')}")
+
+            if not url:
+                self._count("missing_url")
+            elif self.score_th is not None and score < self.score_th:
+                self._count("low_score")
+            elif self.score_ra is not None and rating is not None and rating < self.score_ra:
+                self._count("low_rating")
+            elif not self.is_allowed_site(url):
+                self._count("other_website")
+            elif not self.is_product_page(url):
+                self._count("not_product_page")
+            else:
+                duplicate = deduplicator.check(url, result.get("title"))
+                if duplicate:
+                    self._count(duplicate)
+                    continue
+                kept.append({
+                    "title": result.get("title") or "",
+                    "url": canonicalize_url(url),
+                    "content": result.get("content") or "",
+                    "score": score,
+                    "rating": rating,
+                    "search_query": result.get("search_query") or ""
+                })
+                self._count("kept")
+        return kept
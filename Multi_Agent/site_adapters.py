@@ -0,0 +1,405 @@
+import argparse
+import json
+import os
+import re
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from urls import canonicalize_url
+
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+                  "Chrome/124.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9,ar;q=0.8",
+}
+
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+HIDDEN_TAGS = {"script", "style", "noscript", "template"}
+
+
+class AdapterError(ValueError):
+    """Raised when a page does not contain the structured product data an adapter needs"""
+
+
+class Node:
+    """Element of the light DOM built by PageParser"""
+    __slots__ = ("tag", "attrs", "children", "parent")
+
+    def __init__(self, tag, attrs=None, parent=None):
+        self.tag = tag
+        self.attrs = attrs or {}
+        self.children = []
+        self.parent = parent
+
+    @property
+    def classes(self):
+        return (self.attrs.get("class") or "").split()
+
+    def iter(self):
+        yield self
+        for child in self.children:
+            if isinstance(child, Node):
+                yield from child.iter()
+
+    def find_all(self, tag=None, id=None, cls=None, **attrs):
+        """Descendant elements matching the tag, id, a class and attribute values (True: present)"""
+        for node in self.iter():
+            if node is self or (tag and node.tag != tag) or (id and node.attrs.get("id") != id):
+                continue
+            if cls and cls not in node.classes:
+                continue
+            if all((name in node.attrs) if value is True else node.attrs.get(name) == value
+                   for name, value in attrs.items()):
+                yield node
+
+    def find(self, tag=None, id=None, cls=None, **attrs):
+        return next(self.find_all(tag, id, cls, **attrs), None)
+
+    def raw_text(self):
+        return "".join(child if isinstance(child, str) else child.raw_text() for child in self.children)
+
+    def text(self):
+        """Visible text with whitespace collapsed"""
+        parts = []
+        for child in self.children:
+            if isinstance(child, str):
+                parts.append(child)
+            elif child.tag not in HIDDEN_TAGS:
+                parts.append(" " + child.text() + " ")
+        return " ".join("".join(parts).split())
+
+
+class PageParser(HTMLParser):
+    """Builds a tolerant light DOM of an html page with the standard library parser"""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = Node("document")
+        self._stack = [self.root]
+
+    def handle_starttag(self, tag, attrs):
+        node = Node(tag, {name: value or "" for name, value in attrs}, self._stack[-1])
+        self._stack[-1].children.append(node)
+        if tag not in VOID_TAGS:
+            self._stack.append(node)
+
+    def handle_startendtag(self, tag, attrs):
+        self._stack[-1].children.append(Node(tag, {name: value or "" for name, value in attrs}, self._stack[-1]))
+
+    def handle_endtag(self, tag):
+        # Close the nearest open element with this tag and everything left open inside it
+        for index in range(len(self._stack) - 1, 0, -1):
+            if self._stack[index].tag == tag:
+                del self._stack[index:]
+                return
+
+    def handle_data(self, data):
+        self._stack[-1].children.append(data)
+
+
+def parse_html(html):
+    parser = PageParser()
+    parser.feed(html)
+    parser.close()
+    return parser.root
+
+
+def _json(text):
+    try:
+        return json.loads(text, strict=False)
+    except (TypeError, ValueError):
+        return None
+
+
+def _walk(data):
+    """Every dict nested in a JSON document"""
+    if isinstance(data, dict):
+        yield data
+        for value in data.values():
+            yield from _walk(value)
+    elif isinstance(data, list):
+        for value in data:
+            yield from _walk(value)
+
+
+def _first_dict(data, key):
+    """The first dict of the nested JSON document holding a non-empty value for `key`"""
+    return next((item for item in _walk(data) if item.get(key) not in (None, "", [], {})), None)
+
+
+def _image(value):
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, dict):
+        value = value.get("url") or value.get("contentUrl")
+    return value
+
+
+def json_ld_product(page):
+    """The schema.org Product of the page's JSON-LD blocks, or None"""
+    for script in page.find_all("script", type="application/ld+json"):
+        for item in _walk(_json(script.raw_text())):
+            types = item.get("@type")
+            if types == "Product" or (isinstance(types, list) and "Product" in types):
+                return item
+    return None
+
+
+class SiteAdapter:
+    """
+    Extracts a product from a page's structured data without the AI scraper.
+
+    `extract` fills the scraped fields from the site-specific markup first, then
+    from the schema.org JSON-LD Product and the OpenGraph/product meta tags. Raw
+    values are returned; ScrapingAgent normalizes and validates them like a
+    smartscraper response; a currency the page does not declare in
+    `product_currency` is taken from the price text there. Subclasses set `hosts`
+    and override `_from_page`.
+    """
+    name = "generic"
+    hosts = ()
+
+    def matches(self, url):
+        host = urlparse(url).netloc.lower()
+        return any(host == suffix or host.endswith("." + suffix) for suffix in self.hosts)
+
+    def _from_page(self, page, page_url):
+        return {}
+
+    def _from_json_ld(self, page, page_url):
+        product = json_ld_product(page)
+        if product is None:
+            return {}
+        offers = product.get("offers")
+        if isinstance(offers, list):
+            offers = offers[0] if offers else {}
+        offers = offers if isinstance(offers, dict) else {}
+        price_specification = offers.get("priceSpecification") or {}
+        price = offers.get("price") or offers.get("lowPrice") or price_specification.get("price")
+        return {
+            "product_title": product.get("name"),
+            "product_image_url": _image(product.get("image")),
+            "product_url": product.get("url") or offers.get("url"),
+            "product_current_price": price,
+            "product_currency": offers.get("priceCurrency") or price_specification.get("priceCurrency"),
+            "product_specs": [
+                {"specification_name": spec.get("name"), "specification_value": spec.get("value")}
+                for spec in product.get("additionalProperty") or [] if isinstance(spec, dict)
+            ],
+        }
+
+    def _from_meta(self, page, page_url):
+        meta = {}
+        for node in page.find_all("meta", content=True):
+            key = (node.attrs.get("property") or node.attrs.get("name") or node.attrs.get("itemprop") or "").lower()
+            meta.setdefault(key, node.attrs["content"])
+        return {
+            "product_title": meta.get("og:title") or meta.get("twitter:title"),
+            "product_image_url": meta.get("og:image") or meta.get("twitter:image"),
+            "product_url": meta.get("og:url"),
+            "product_current_price": meta.get("product:price:amount") or meta.get("og:price:amount") or meta.get("price"),
+            "product_currency": meta.get("product:price:currency") or meta.get("og:price:currency")
+            or meta.get("pricecurrency"),
+        }
+
+    def extract(self, page_url, html):
+        """Return the raw scraped fields of a product page; raises AdapterError"""
+        page = parse_html(html)
+        data = {}
+        for source in (self._from_page, self._from_json_ld, self._from_meta):
+            for key, value in source(page, page_url).items():
+                if value not in (None, "", []) and data.get(key) in (None, "", []):
+                    data[key] = value
+        missing = [key for key in ("product_title", "product_current_price") if data.get(key) in (None, "")]
+        if missing:
+            raise AdapterError(f"{self.name}: no {', '.join(missing)} in the page's structured data")
+        data["page_url"] = page_url
+        data["product_url"] = canonicalize_url(urljoin(page_url, data.get("product_url") or page_url))
+        return data
+
+
+def _table_specs(table):
+    """(name, value) specs from the two-cell rows of a specification table"""
+    specs = []
+    for row in table.find_all("tr"):
+        cells = [cell.text() for cell in row.children if isinstance(cell, Node) and cell.tag in ("th", "td")]
+        if len(cells) >= 2 and cells[0] and cells[-1]:
+            specs.append({"specification_name": cells[0], "specification_value": cells[-1]})
+    return specs
+
+
+class AmazonAdapter(SiteAdapter):
+    name = "amazon"
+    hosts = ("amazon.eg", "amazon.sa", "amazon.ae")
+
+    def _from_page(self, page, page_url):
+        title = page.find(id="productTitle")
+        price_box = next(filter(None, (page.find(id=box) for box in (
+            "corePriceDisplay_desktop_feature_div", "corePrice_feature_div", "apex_desktop"))), page)
+        current = next((node for node in price_box.find_all("span", cls="a-offscreen")
+                        if node.parent.attrs.get("data-a-strike") != "true"), None)
+        whole = price_box.find("span", cls="a-price-whole")
+        strike = price_box.find("span", cls="a-price", **{"data-a-strike": "true"})
+        image = page.find("img", id="landingImage")
+        specs = []
+        for table_id in ("productOverview_feature_div", "productDetails_techSpec_section_1",
+                         "productDetails_techSpec_section_2"):
+            table = page.find(id=table_id)
+            if table is not None:
+                specs.extend(_table_specs(table))
+        return {
+            "product_title": title.text() if title else None,
+            "product_current_price": current.text() if current and current.text() else (whole.text() if whole else None),
+            "product_original_price": strike.find("span", cls="a-offscreen").text()
+            if strike and strike.find("span", cls="a-offscreen") else None,
+            "product_image_url": (image.attrs.get("data-old-hires") or image.attrs.get("src")) if image else None,
+            "product_specs": specs,
+        }
+
+
+class JumiaAdapter(SiteAdapter):
+    name = "jumia"
+    hosts = ("jumia.com.eg", "jumia.com.ng", "jumia.co.ke", "jumia.ma")
+
+    def _from_page(self, page, page_url):
+        title = page.find("h1")
+        price = page.find("span", cls="-fs24")
+        original = page.find("span", cls="-lthr")
+        specs = []
+        for item in page.find_all("li"):
+            label = item.find("span", cls="-b")
+            if label is not None:
+                name = label.text()
+                value = item.text()[len(name):].lstrip(" :")
+                if name and value:
+                    specs.append({"specification_name": name, "specification_value": value})
+        return {
+            "product_title": title.text() if title else None,
+            "product_current_price": price.text() if price else None,
+            "product_original_price": original.text() if original else None,
+            "product_specs": specs,
+        }
+
+
+class NoonAdapter(SiteAdapter):
+    name = "noon"
+    hosts = ("noon.com",)
+    # Product pages end in /<sku>/p/, e.g. /saudi-en/espresso/N12345678AB/p/
+    SKU_PATTERN = re.compile(r"/([A-Za-z0-9]+)/p/?$")
+
+    def _product(self, data, page_url):
+        """
+        The page's own product dict. The page data also holds recommended and related
+        products, so with a SKU in the url only the dict with that `sku` matches.
+        """
+        match = self.SKU_PATTERN.search(urlparse(page_url).path)
+        if match is None:
+            return _first_dict(data, "product_title")
+        sku = match.group(1).upper()
+        products = [item for item in _walk(data) if str(item.get("sku") or "").upper() == sku]
+        return next((item for item in products if item.get("product_title")), products[0] if products else None)
+
+    @staticmethod
+    def _offer(product):
+        """The product's own offer: on the product itself, in its offers or in its variants' offers"""
+        offers = [product, *(product.get("offers") or [])]
+        for variant in product.get("variants") or []:
+            if isinstance(variant, dict):
+                offers.extend(variant.get("offers") or [])
+        return next((offer for offer in offers if isinstance(offer, dict)
+                     and (offer.get("sale_price") or offer.get("price"))), {})
+
+    def _from_page(self, page, page_url):
+        script = page.find("script", id="__NEXT_DATA__")
+        data = _json(script.raw_text()) if script else None
+        # Read every field from the product's own dict, not from related products elsewhere in the page data
+        product = self._product(data, page_url)
+        if product is None:
+            return {}
+        offer = self._offer(product)
+        sale_price, price = offer.get("sale_price"), offer.get("price")
+        return {
+            "product_title": product.get("product_title"),
+            "product_current_price": sale_price or price,
+            "product_original_price": price if sale_price else None,
+            "product_currency": offer.get("currency") or offer.get("currency_code") or product.get("currency"),
+            "product_specs": [
+                {"specification_name": spec.get("name") or spec.get("code"), "specification_value": spec.get("value")}
+                for spec in product.get("specifications") or [] if isinstance(spec, dict)
+            ],
+        }
+
+
+DEFAULT_ADAPTERS = (AmazonAdapter(), JumiaAdapter(), NoonAdapter())
+
+
+def adapter_for(url, adapters=DEFAULT_ADAPTERS):
+    return next((adapter for adapter in adapters if adapter.matches(url)), None)
+
+
+class PageFetcher:
+    """
+    Fetches product pages over one pooled requests.Session, so every crew of the
+    process reuses the keep-alive connections to the shop hosts.
+    """
+    def __init__(self, timeout=20, pool_size=20, headers=None):
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(headers or DEFAULT_HEADERS)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def fetch(self, url):
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        if response.encoding is None or response.encoding.lower() == "iso-8859-1":
+            # requests' default for html served without a charset; the shops serve utf-8
+            response.encoding = "utf-8"
+        return response.text
+
+
+def _page_url(html):
+    """The canonical url a saved page declares, for fixtures saved without their url"""
+    page = parse_html(html)
+    link = page.find("link", rel="canonical")
+    meta = page.find("meta", property="og:url")
+    return (link.attrs.get("href") if link else None) or (meta.attrs.get("content") if meta else None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract products from saved or live product pages with the site adapters")
+    parser.add_argument("sources", nargs="+", help="Saved html files or product page urls")
+    parser.add_argument("--url", help="Page url of the saved html files (default: their canonical url)")
+    parser.add_argument("--save-dir", help="Save the html of fetched urls here, to rerun them offline")
+    args = parser.parse_args()
+
+    fetcher = None
+    for source in args.sources:
+        if re.match(r"https?://", source):
+            fetcher = fetcher or PageFetcher()
+            page_url, html = source, fetcher.fetch(source)
+            if args.save_dir:
+                os.makedirs(args.save_dir, exist_ok=True)
+                path = os.path.join(args.save_dir, re.sub(r"[^A-Za-z0-9]+", "-", urlparse(source).path).strip("-")[:80] + ".html")
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(html)
+                print(f"Saved {source} to {path}")
+        else:
+            with open(source, encoding="utf-8") as f:
+                html = f.read()
+            page_url = args.url or _page_url(html) or ""
+
+        adapter = adapter_for(page_url)
+        if adapter is None:
+            print(f"{source}: no adapter for {page_url or 'an unknown url'}")
+            continue
+        try:
+            print(f"{source} ({adapter.name}):")
+            print(json.dumps(adapter.extract(page_url, html), indent=2, ensure_ascii=False))
+        except AdapterError as e:
+            print(f"{source}: {e}")
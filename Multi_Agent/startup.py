@@ -0,0 +1,39 @@
+import importlib
+import sys
+import time
+
+
+# Heavy modules in the order a full run imports them
+HEAVY_MODULES = ("dotenv", "crewai", "tavily", "scrapegraph_py", "agentops", "pipeline")
+
+
+def profile_imports(modules=HEAVY_MODULES):
+    """
+    Import `modules` one by one and return (module, seconds) pairs.
+
+    Shared dependencies are charged to the first module that pulls them in, so the
+    numbers add up to the total cold start cost. Modules that are not installed
+    are reported with a time of None.
+    """
+    timings = []
+    for module in modules:
+        if module in sys.modules:
+            timings.append((module, 0.0))
+            continue
+        started = time.perf_counter()
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            timings.append((module, None))
+            continue
+        timings.append((module, time.perf_counter() - started))
+    return timings
+
+
+def print_import_profile(timings, budget=None):
+    """Print the import-time breakdown; returns False when the total is over `budget` seconds"""
+    total = sum(seconds for _, seconds in timings if seconds)
+    for module, seconds in timings:
+        print(f"{module:<18}{'not installed' if seconds is None else f'{seconds:8.3f}s'}")
+    print(f"{'total':<18}{total:8.3f}s" + (f"  (budget {budget:.3f}s)" if budget else ""))
+    return budget is None or total <= budget
@@ -0,0 +1,186 @@
+import asyncio
+import json
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from crewai import Crew
+from crewai.tasks.task_output import TaskOutput
+
+from search_filters import ProductDeduplicator
+from urls import canonicalize_url
+
+
+class StreamingSearchScrape:
+    """
+    Overlapped search and scraping stage.
+
+    Every query is searched concurrently; as soon as one search returns, its results
+    are filtered and the new product urls are pushed to the scrape pool, so pages
+    are scraped while the remaining searches are still running. Extracted products
+    are passed to `on_product` as they complete.
+    """
+    def __init__(self, search_engine, web_scraping, on_product=None):
+        self.search_engine = search_engine
+        self.web_scraping = web_scraping
+        self.on_product = on_product
+        self._lock = threading.Lock()
+
+    def _search_results(self, query, response, deduplicator):
+        """Filter one query's results, dropping products already queued for scraping"""
+        results = [{**result, "search_query": query} for result in response.get("results", [])]
+        if self.search_engine.result_filter is None:
+            return [
+                {"title": r.get("title") or "", "url": canonicalize_url(r["url"]), "content": r.get("content") or "",
+                 "score": float(r.get("score") or 0.0), "rating": r.get("rating"), "search_query": query}
+                for r in results if r.get("url") and deduplicator.check(r["url"], r.get("title")) is None
+            ]
+        return self.search_engine.result_filter.apply(results, deduplicator=deduplicator)
+
+    def run(self, queries):
+        """Return (AllSearchResult, AllExtractedProducts, failed queries, ScrapeFailure list)"""
+        queries = list(dict.fromkeys(q.strip() for q in queries if q and q.strip()))
+        search_results, products, failed_queries, scrape_failures = [], [], [], []
+        deduplicator = ProductDeduplicator()
+
+        with ThreadPoolExecutor(max_workers=max(1, self.search_engine.max_concurrency)) as search_pool, \
+                ThreadPoolExecutor(max_workers=max(1, self.web_scraping.max_workers)) as scrape_pool:
+            pending = {search_pool.submit(self.search_engine._search, query): ("search", query) for query in queries}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    kind, key = pending.pop(future)
+                    error = future.exception()
+                    if kind == "search":
+                        if error is not None:
+                            failed_queries.append({"query": key, "error": str(error)})
+                            continue
+                        for result in self._search_results(key, future.result(), deduplicator):
+                            search_results.append(result)
+                            pending[scrape_pool.submit(self.web_scraping.scrape_product, result["url"])] = ("scrape", result["url"])
+                    elif error is not None:
+                        scrape_failures.append(self.web_scraping.ScrapeFailure(
+                            page_url=key,
+                            error=str(getattr(error, "last_error", error)),
+                            attempts=getattr(error, "attempts", 1)
+                        ))
+                    else:
+                        product = future.result()
+                        products.append(product)
+                        if self.on_product:
+                            with self._lock:
+                                self.on_product(product)
+
+        print(f"Streamed {len(queries)} queries -> {len(search_results)} pages -> {len(products)} products "
+              f"({len(failed_queries)} failed queries, {len(scrape_failures)} failed pages, "
+              f"{deduplicator.scrapes_avoided} duplicate scrapes avoided: {deduplicator.stats})")
+        return (
+            self.search_engine.AllSearchResults(results=search_results),
+            self.web_scraping.AllExtractedProducts(products=products),
+            failed_queries,
+            scrape_failures
+        )
+
+
+class StreamingCrew:
+    """
+    Runs the Ohay pipeline with the search and scraping steps replaced by the
+    streaming stage: the recommendation crew runs first, then the streaming
+    search/scrape stage, then a crew with the report steps. Exposes the same
+    kickoff/kickoff_async interface as Crew; both crews are built with `crew_cls`.
+    """
+    STREAMED_STEPS = ("search", "scraping")
+
+    def __init__(self, steps, tasks, crew_kwargs, search_engine, web_scraping, metrics, crew_cls=Crew):
+        self.steps = steps
+        self.tasks = dict(tasks)
+        self.crew_kwargs = crew_kwargs
+        self.search_engine = search_engine
+        self.web_scraping = web_scraping
+        self.metrics = metrics
+        self.crew_cls = crew_cls
+
+    def _finish_step(self, step, model):
+        """Attach a streamed step's output to its task, write its output file and report it"""
+        task = self.tasks[step]
+        json_dict = model.model_dump()
+        task.output = TaskOutput(
+            name=step,
+            description=task.description,
+            expected_output=task.expected_output,
+            raw=json.dumps(json_dict),
+            json_dict=json_dict,
+            agent=task.agent.role
+        )
+        if task.guardrail:
+            # Same post-processing as the agent task, e.g. the product ranking. The streamed
+            # output is built in code, so a retry would fail the same way: fail the step instead
+            ok, result = task.guardrail(task.output)
+            if not ok:
+                raise ValueError(f"Streamed step '{step}' failed its guardrail: {result}")
+            if isinstance(result, TaskOutput):
+                task.output = result
+                json_dict = result.json_dict or json_dict
+            elif isinstance(result, str):
+                try:
+                    json_dict = json.loads(result)
+                except ValueError as e:
+                    raise ValueError(f"The guardrail of streamed step '{step}' returned invalid JSON: {e}")
+                task.output = task.output.model_copy(update={"raw": result, "json_dict": json_dict})
+        if task.output_file:
+            os.makedirs(os.path.dirname(task.output_file) or ".", exist_ok=True)
+            with open(task.output_file, "w", encoding="utf-8") as f:
+                json.dump(json_dict, f, indent=2)
+        if task.callback:
+            task.callback(task.output)
+        self.metrics.on_task_end(task.output)
+
+    def _stream(self):
+        recommendation = self.tasks["recommendation"].output
+        queries = (recommendation.json_dict or json.loads(recommendation.raw)).get("queries", [])
+
+        stream_path = os.path.join(self.web_scraping.output_dir, "step_3_search_results.jsonl")
+        os.makedirs(self.web_scraping.output_dir, exist_ok=True)
+        with open(stream_path, "w", encoding="utf-8") as stream_file:
+            def on_product(product):
+                stream_file.write(product.model_dump_json() + "\n")
+                stream_file.flush()
+
+            search_results, products, failed_queries, scrape_failures = StreamingSearchScrape(
+                self.search_engine, self.web_scraping, on_product=on_product
+            ).run(queries)
+
+        # Same shape as the failures the search and bulk scraping tools report
+        failures_path = os.path.join(self.web_scraping.output_dir, "step_3_failures.json")
+        with open(failures_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "failed_queries": failed_queries,
+                "failures": [
+                    {"page_url": failure.page_url, "error": failure.error, "attempts": failure.attempts}
+                    for failure in scrape_failures
+                ]
+            }, f, indent=2)
+        if failed_queries or scrape_failures:
+            print(f"{len(failed_queries)} queries and {len(scrape_failures)} pages failed, see {failures_path}")
+
+        self._finish_step("search", search_results)
+        self._finish_step("scraping", products)
+
+    def kickoff(self, inputs=None):
+        self.metrics.before_kickoff(inputs)
+        to_run = [step for step, _ in self.steps]
+        before = [task for step, task in self.steps if step == "recommendation"]
+        after = [task for step, task in self.steps if step not in ("recommendation",) + self.STREAMED_STEPS]
+
+        result = None
+        if before:
+            result = self.crew_cls(tasks=before, **self.crew_kwargs).kickoff(inputs=inputs)
+        if any(step in to_run for step in self.STREAMED_STEPS):
+            self._stream()
+        if after:
+            result = self.crew_cls(tasks=after, **self.crew_kwargs).kickoff(inputs=inputs)
+        self.metrics.after_kickoff(result)
+        return result
+
+    async def kickoff_async(self, inputs=None):
+        return await asyncio.to_thread(self.kickoff, inputs)
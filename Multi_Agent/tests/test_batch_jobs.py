@@ -0,0 +1,47 @@
+import asyncio
+import json
+import os
+
+import pytest
+from crewai import Task
+
+from batch_jobs import resolve_output_root, run_batch
+
+
+JOB = {"job_id": "coffee", "inputs": {"product_name": "Coffee Machine"}}
+
+
+class FileWritingCrew:
+    """Writes a step file through a crewai Task's output_file and a run file to output_dir, like build_crew's crews"""
+    def __init__(self, inputs, output_dir):
+        self.output_dir = output_dir
+        self.task = Task(description="d", expected_output="e",
+                         output_file=os.path.join(output_dir, "step_1_suggested_search_queries.json"))
+
+    async def kickoff_async(self, inputs=None):
+        os.makedirs(os.path.dirname(self.task.output_file), exist_ok=True)
+        with open(self.task.output_file, "w", encoding="utf-8") as f:
+            json.dump(inputs, f)
+        with open(os.path.join(self.output_dir, "run_metrics.json"), "w", encoding="utf-8") as f:
+            json.dump({}, f)
+
+
+def test_batch_with_an_absolute_root_keeps_each_job_in_one_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    output_root = str(tmp_path / "srv" / "out")
+
+    summary = asyncio.run(run_batch([JOB], FileWritingCrew, output_root=output_root))
+
+    assert summary[0]["status"] == "done"
+    job_dir = tmp_path / "srv" / "out" / "coffee"
+    assert sorted(os.listdir(job_dir)) == ["run_metrics.json", "step_1_suggested_search_queries.json"]
+    assert (tmp_path / "srv" / "out" / "batch_summary.json").exists()
+
+
+def test_output_root_outside_the_current_directory_is_rejected(tmp_path, monkeypatch):
+    (tmp_path / "work").mkdir()
+    monkeypatch.chdir(tmp_path / "work")
+
+    with pytest.raises(ValueError, match="outside the current directory"):
+        resolve_output_root(str(tmp_path / "out"))
+    assert resolve_output_root(str(tmp_path / "work" / "out")) == "out"
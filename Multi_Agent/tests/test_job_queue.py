@@ -0,0 +1,32 @@
+import asyncio
+import os
+
+import pytest
+
+from job_queue import JobQueue, QueueWorker
+from test_batch_jobs import FileWritingCrew
+
+
+ROW = {"product_name": "Coffee Machine", "websites_list": ["www.amazon.eg"], "country_name": "Egypt"}
+
+
+def test_worker_writes_each_job_to_one_directory_under_an_absolute_root(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    queue = JobQueue(str(tmp_path / "jobs.sqlite"))
+    job_id = queue.enqueue({**ROW, "job_id": "coffee"})
+    worker = QueueWorker(queue, FileWritingCrew, output_root=str(tmp_path / "srv" / "out"), poll_interval=0.01)
+
+    assert asyncio.run(worker.run(once=True)) == 1
+
+    job = queue.get(job_id)
+    assert job["status"] == "done"
+    assert os.path.abspath(job["output_dir"]) == str(tmp_path / "srv" / "out" / "coffee")
+    assert sorted(os.listdir(job["output_dir"])) == ["run_metrics.json", "step_1_suggested_search_queries.json"]
+
+
+def test_worker_rejects_an_output_root_outside_the_current_directory(tmp_path, monkeypatch):
+    (tmp_path / "work").mkdir()
+    monkeypatch.chdir(tmp_path / "work")
+
+    with pytest.raises(ValueError, match="outside the current directory"):
+        QueueWorker(JobQueue(str(tmp_path / "jobs.sqlite")), FileWritingCrew, output_root=str(tmp_path / "out"))
@@ -0,0 +1,42 @@
+import json
+
+from output_repair import OutputRepairer
+from web_scraping import PLACEHOLDER, AllExtractedProducts, slim_product
+
+
+def test_product_without_recommendation_fields_is_kept():
+    text = json.dumps({"products": [{
+        "page_url": "https://www.jumia.com.eg/galaxy-a55.html",
+        "product_url": "https://www.jumia.com.eg/galaxy-a55.html",
+        "product_title": "Samsung Galaxy A55",
+        "product_image_url": "https://eg.jumia.is/galaxy-a55.jpg",
+        "product_current_price": "EGP 1,299",
+        "product_specs": [["Storage", "256 GB"]]
+    }]})
+    repairer = OutputRepairer()
+
+    products = repairer.repair_text(AllExtractedProducts, text).products
+
+    assert len(products) == 1
+    assert products[0].product_current_price == 1299.0
+    assert products[0].agent_recommendation_rank == 0
+    assert products[0].agent_recommendation_notes == []
+    assert "products[0].agent_recommendation_rank: defaulted to 0" in repairer.report
+
+
+def test_missing_specs_are_padded_with_marked_placeholders():
+    text = json.dumps({"products": [{
+        "page_url": "https://www.noon.com/saudi-en/espresso/N12345678AB/p/",
+        "product_url": "https://www.noon.com/saudi-en/espresso/N12345678AB/p/",
+        "product_title": "Espresso Machine 1350W",
+        "product_image_url": "https://f.nooncdn.com/p/x.jpg",
+        "product_current_price": 749,
+        "product_specs": []
+    }]})
+    repairer = OutputRepairer()
+
+    product = repairer.repair_text(AllExtractedProducts, text).products[0]
+
+    assert [spec.specification_value for spec in product.product_specs] == [PLACEHOLDER]
+    assert "products[0].product_specs: padded 0 items to 1 with 'not listed' placeholders" in repairer.report
+    assert slim_product(product)["product_specs"] == []
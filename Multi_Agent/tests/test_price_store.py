@@ -0,0 +1,36 @@
+import sqlite3
+
+from price_store import PriceStore
+
+
+PRODUCT = {"page_url": "https://www.jumia.com.eg/coffee-maker-12345.html", "product_title": "Coffee Maker",
+           "product_current_price": 1299.0, "product_currency": "EGP"}
+
+
+def test_prices_are_stored_with_their_currency(tmp_path):
+    store = PriceStore(str(tmp_path / "prices.sqlite"))
+    store.record(PRODUCT, scraped_at=1.0)
+    store.record({**PRODUCT, "product_current_price": 1199.0}, scraped_at=2.0)
+
+    assert [row["product_currency"] for row in store.query(currency="EGP")] == ["EGP"]
+    assert store.query(currency="SAR") == []
+    trend = store.price_trends([PRODUCT["page_url"]])[PRODUCT["page_url"]]
+    assert (trend["first_price"], trend["latest_price"], trend["currency"]) == (1299.0, 1199.0, "EGP")
+
+
+def test_a_store_without_currency_columns_is_migrated(tmp_path):
+    path = str(tmp_path / "prices.sqlite")
+    with sqlite3.connect(path) as conn:
+        conn.executescript("""
+            CREATE TABLE products (product_url TEXT PRIMARY KEY, page_url TEXT NOT NULL, site TEXT NOT NULL,
+                country TEXT, category TEXT, product_title TEXT, product_current_price REAL,
+                product_original_price REAL, product_discount_percentage REAL, record TEXT NOT NULL,
+                first_seen REAL NOT NULL, last_scraped REAL NOT NULL);
+            CREATE TABLE price_history (product_url TEXT NOT NULL, scraped_at REAL NOT NULL, current_price REAL,
+                original_price REAL, discount_percentage REAL);
+        """)
+
+    store = PriceStore(path)
+    store.record(PRODUCT)
+
+    assert store.query()[0]["product_currency"] == "EGP"
@@ -0,0 +1,63 @@
+import pytest
+from pydantic import BaseModel
+from crewai import LLM, Agent
+from crewai.utilities.events import TaskCompletedEvent, TaskFailedEvent
+from crewai.utilities.events.crewai_event_bus import crewai_event_bus
+
+from procurement_report_critic import SectionRevisionTask
+
+
+class Narrative(BaseModel):
+    summary: str
+
+
+class StubCritic:
+    max_rounds = 1
+
+    def __init__(self):
+        self.rewrites = []
+
+    def rewrite_sections(self, agent, narrative, flagged, step="revision"):
+        self.rewrites.append(flagged)
+        return {"sections": [{"section": section, "text": "Rewritten"} for section in flagged]}
+
+    def section_value(self, section, text):
+        return text
+
+
+def revision_task(guardrail, max_retries=1):
+    agent = Agent(role="Author", goal="g", backstory="b", llm=LLM(model="groq/llama-3.1-8b-instant"))
+    task = SectionRevisionTask(description="Revise", expected_output="Narrative", agent=agent,
+                               output_json=Narrative, guardrail=guardrail, max_retries=max_retries)
+    task._critic = StubCritic()
+    return task, agent
+
+
+def test_finish_rewrites_the_report_the_guardrail_rejects():
+    results = iter([(False, "The summary is empty"), (True, '{"summary": "Checked"}')])
+    task, agent = revision_task(lambda task_output: next(results))
+    events = []
+
+    with crewai_event_bus.scoped_handlers():
+        crewai_event_bus.on(TaskCompletedEvent)(lambda source, event: events.append(event))
+        output = task._finish(agent, {"summary": ""})
+
+    assert task._critic.rewrites == [{"summary": ["The summary is empty"]}]
+    assert output.json_dict == {"summary": "Checked"}
+    assert task.output is output and task.end_time is not None
+    assert [event.output for event in events] == [output]
+
+
+def test_execute_fails_after_max_retries():
+    task, agent = revision_task(lambda task_output: (False, "Render failed"), max_retries=1)
+    task._revise = lambda agent: {"summary": "Draft"}
+    failures = []
+
+    with crewai_event_bus.scoped_handlers():
+        crewai_event_bus.on(TaskFailedEvent)(lambda source, event: failures.append(event.error))
+        with pytest.raises(Exception, match="after 1 retries"):
+            task.execute_sync()
+
+    assert task.output is None
+    assert len(task._critic.rewrites) == 1
+    assert len(failures) == 1
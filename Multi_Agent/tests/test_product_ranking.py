@@ -0,0 +1,44 @@
+from product_ranking import ProductRanker
+from report_renderer import ReportRenderer
+from web_scraping import PLACEHOLDER
+
+
+PADDED_SPEC = {"specification_name": PLACEHOLDER, "specification_value": PLACEHOLDER}
+
+
+def product(url, price, specs):
+    return {"page_url": url, "product_title": url, "product_current_price": price, "product_specs": specs}
+
+
+def test_placeholder_specs_are_not_scored():
+    products = [
+        product("a", 100.0, [{"specification_name": "Power", "specification_value": "1350 W"}]),
+        product("b", 100.0, [{"specification_name": "Power", "specification_value": "1000 W"}]),
+        product("c", 100.0, [PADDED_SPEC]),
+    ]
+
+    scores = ProductRanker(weights={"price": 0, "discount": 0, "rating": 0, "specs": 1}).score(products)
+
+    assert list(scores) == [1.0, 0.0, 0.0]
+
+
+def test_placeholder_specs_are_not_rendered(tmp_path):
+    specs = [{"specification_name": "Power", "specification_value": "1350 W"}, PADDED_SPEC]
+
+    html = ReportRenderer(output_dir=str(tmp_path))._appendices([product("a", 100.0, specs)])
+
+    assert "Power: 1350 W" in html.split("<details>")[0]
+    assert PLACEHOLDER not in html.split("<details>")[0]
+
+
+def test_prices_are_only_compared_within_a_currency():
+    products = [
+        {**product("a", 1000.0, []), "product_currency": "EGP"},
+        {**product("b", 2000.0, []), "product_currency": "EGP"},
+        {**product("c", 100.0, []), "product_currency": "SAR"},
+        {**product("d", 300.0, []), "product_currency": "SAR"},
+    ]
+
+    scores = ProductRanker(weights={"price": 1, "discount": 0, "rating": 0, "specs": 0}).score(products)
+
+    assert list(scores) == [1.0, 0.0, 1.0, 0.0]
@@ -0,0 +1,109 @@
+import os
+
+import pytest
+from crewai import LLM
+
+from response_cache import ResponseCache
+from site_adapters import AdapterError, _page_url, adapter_for
+from urls import canonicalize_url
+from web_scraping import ScrapingAgent, normalize_scraped_product
+
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def load(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        html = f.read()
+    return _page_url(html), html
+
+
+@pytest.mark.parametrize("fixture, adapter, title, current, original, currency", [
+    ("amazon.html", "amazon", "De'Longhi Magnifica S Coffee Machine & Grinder", 14999.0, 17500.0, "EGP"),
+    ("jumia.html", "jumia", "Black+Decker Coffee Maker 12 Cups", 1299.0, 1650.0, "EGP"),
+    ("noon.html", "noon", "Espresso Machine 1350W", 749.0, 899.0, "SAR"),
+    ("noon_recommendations.html", "noon", "Drip Coffee Maker 1.25L", 1499.0, 1850.0, "EGP"),
+])
+def test_extract(fixture, adapter, title, current, original, currency):
+    page_url, html = load(fixture)
+    site_adapter = adapter_for(page_url)
+
+    data = normalize_scraped_product(site_adapter.extract(page_url, html))
+
+    assert site_adapter.name == adapter
+    assert data["product_title"] == title
+    assert data["product_current_price"] == current
+    assert data["product_original_price"] == original
+    assert data["product_currency"] == currency
+    assert data["product_specs"]
+
+
+def test_noon_reads_the_product_not_its_related_products():
+    page_url, html = load("noon.html")
+
+    data = adapter_for(page_url).extract(page_url, html)
+
+    assert data["product_specs"] == [
+        {"specification_name": "Power", "specification_value": "1350 W"},
+        {"specification_name": "Capacity", "specification_value": "1.5 L"},
+    ]
+
+
+@pytest.mark.parametrize("fixture", ["amazon_captcha.html", "noon_empty.html"])
+def test_unparsable_page_raises_adapter_error(fixture):
+    page_url, html = load(fixture)
+
+    with pytest.raises(AdapterError):
+        adapter_for(page_url).extract(page_url, html)
+
+
+class SavedPageFetcher:
+    def __init__(self, html):
+        self.html = html
+
+    def fetch(self, url):
+        return self.html
+
+
+class StubScrapeClient:
+    def __init__(self):
+        self.urls = []
+
+    def smartscraper(self, website_url, user_prompt):
+        self.urls.append(website_url)
+        return {"result": {
+            "product_title": "Robot checked product",
+            "product_image_url": "https://m.media-amazon.com/robot.jpg",
+            "product_current_price": "EGP 999",
+            "product_specs": [["Brand", "Acme"]],
+        }}
+
+
+def test_scrape_product_falls_back_to_smartscraper(tmp_path):
+    page_url, html = load("amazon_captcha.html")
+    scrape_client = StubScrapeClient()
+    agent = ScrapingAgent(llm=LLM(model="groq/llama-3.1-8b-instant"), output_dir=str(tmp_path),
+                          scrape_client=scrape_client, fetcher=SavedPageFetcher(html))
+
+    product = agent.scrape_product(page_url)
+
+    assert scrape_client.urls == [page_url]
+    assert product.product_current_price == 999.0
+    assert agent.extraction_counts == {"adapter": 0, "smartscraper": 1}
+
+
+def test_a_parse_that_fails_validation_is_not_cached(tmp_path):
+    # Title and price parse, but the page has no image and no specs, so the product does not validate
+    page_url = "https://www.amazon.eg/dp/B07ABCDEFG"
+    html = ('<html><body><span id="productTitle">Coffee Machine</span>'
+            '<span class="a-price"><span class="a-offscreen">EGP 14,999.00</span></span></body></html>')
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"))
+    scrape_client = StubScrapeClient()
+    agent = ScrapingAgent(llm=LLM(model="groq/llama-3.1-8b-instant"), output_dir=str(tmp_path), cache=cache,
+                          scrape_client=scrape_client, fetcher=SavedPageFetcher(html))
+
+    agent.scrape_product(page_url)
+    agent.scrape_product(page_url)
+
+    assert cache.get("scrape", canonicalize_url(page_url), "amazon") is None
+    assert agent.extraction_counts == {"adapter": 0, "smartscraper": 2}
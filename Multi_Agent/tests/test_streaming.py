@@ -0,0 +1,47 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from pydantic import BaseModel
+
+from streaming import StreamingCrew
+
+
+class Products(BaseModel):
+    products: list
+
+
+class RecordingMetrics:
+    def __init__(self):
+        self.outputs = []
+
+    def on_task_end(self, task_output):
+        self.outputs.append(task_output)
+
+
+def streaming_crew(tmp_path, guardrail):
+    task = SimpleNamespace(description="d", expected_output="e", agent=SimpleNamespace(role="scraper"),
+                           guardrail=guardrail, output_file=str(tmp_path / "step_3_search_results.json"), callback=None)
+    metrics = RecordingMetrics()
+    return StreamingCrew([], [("scraping", task)], {}, None, None, metrics), task, metrics
+
+
+def test_finish_step_writes_the_guardrail_result(tmp_path):
+    crew, task, metrics = streaming_crew(tmp_path, lambda output: (True, json.dumps({"products": ["ranked"]})))
+
+    crew._finish_step("scraping", Products(products=["raw"]))
+
+    assert task.output.json_dict == {"products": ["ranked"]}
+    assert json.loads((tmp_path / "step_3_search_results.json").read_text()) == {"products": ["ranked"]}
+    assert metrics.outputs == [task.output]
+
+
+@pytest.mark.parametrize("result", [(False, "ranking failed"), (True, "not json")])
+def test_finish_step_fails_when_the_guardrail_fails(tmp_path, result):
+    crew, task, metrics = streaming_crew(tmp_path, lambda output: result)
+
+    with pytest.raises(ValueError, match="scraping"):
+        crew._finish_step("scraping", Products(products=["raw"]))
+
+    assert not (tmp_path / "step_3_search_results.json").exists()
+    assert metrics.outputs == []
@@ -0,0 +1,51 @@
+import pytest
+
+from web_scraping import normalize_scraped_product, parse_currency, parse_number
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("EGP 1,299.00", 1299.0),
+    ("1.299,50", 1299.5),
+    ("12,5", 12.5),
+    ("1 299 SAR", 1299.0),
+    ("١٢٠٠ ر.س", 1200.0),
+    ("$99.5", 99.5),
+    ("8 GB", 8.0),
+    (749, 749.0),
+])
+def test_parse_number(value, expected):
+    assert parse_number(value) == expected
+
+
+@pytest.mark.parametrize("value", [None, True, "", "not listed"])
+def test_parse_number_without_a_number(value):
+    assert parse_number(value) is None
+
+
+def test_parse_number_prefers_the_number_next_to_a_currency():
+    assert parse_number("Model 2024 - 1,299 EGP") == 1299.0
+    assert parse_number("Galaxy A55 (2024) ج.م ١٬٢٩٩") == 1299.0
+
+
+def test_parse_number_skips_percentages():
+    assert parse_number("15% off 1,299") == 1299.0
+    assert parse_number("Save 20 % now: 2,450") == 2450.0
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("EGP 1,299", "EGP"),
+    ("١٢٠٠ ر.س", "SAR"),
+    ("$99.5", "USD"),
+    ("1,299 L.E", "EGP"),
+    ("ngn", "NGN"),
+    ("1,299", None),
+    (None, None),
+])
+def test_parse_currency(value, expected):
+    assert parse_currency(value) == expected
+
+
+def test_normalize_takes_the_currency_from_the_price_text():
+    data = normalize_scraped_product({"product_current_price": "EGP 1,299", "product_original_price": "EGP 1,650"})
+
+    assert (data["product_currency"], data["product_current_price"]) == ("EGP", 1299.0)
@@ -0,0 +1,97 @@
+import re
+from difflib import SequenceMatcher
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+
+# Query parameters that only track the visit and never change the page content
+TRACKING_PARAMS = {
+    "o", "shareid", "ref", "ref_", "tag", "psc", "qid", "sr", "crid", "sprefix", "smid", "th",
+    "keywords", "spm", "gclid", "fbclid", "msclkid", "_encoding", "content-id", "pd_rd_i",
+    "pd_rd_r", "pd_rd_w", "pd_rd_wg", "pf_rd_p", "pf_rd_r", "dib", "dib_tag", "linkcode", "linkid"
+}
+TRACKING_PREFIXES = ("utm_", "pd_rd_", "pf_rd_")
+
+AMAZON_PRODUCT_PATH = re.compile(r"/(?:dp|gp/product|gp/aw/d)/([A-Z0-9]{10})(?:[/?]|$)", re.IGNORECASE)
+
+# Per-site product id patterns: (host suffix, pattern whose first group is the product id)
+PRODUCT_ID_PATTERNS = (
+    ("amazon.", AMAZON_PRODUCT_PATH),
+    ("noon.com", re.compile(r"/([A-Z0-9]{10,})/p(?:/|$)", re.IGNORECASE)),
+    ("jumia.", re.compile(r"-(\d+)\.html$", re.IGNORECASE)),
+)
+
+# noon serves every country store in several languages: /saudi-en/, /saudi-ar/, /uae-en/...
+NOON_LOCALE = re.compile(r"^/([a-z]+)-(en|ar)(?=/)", re.IGNORECASE)
+
+
+def _is_tracking_param(key):
+    key = key.lower()
+    return key in TRACKING_PARAMS or key.startswith(TRACKING_PREFIXES)
+
+
+def canonicalize_url(url):
+    """
+    Normalize a url so that different spellings of the same page compare equal.
+
+    Lowercases scheme and host, maps mobile hosts to www, drops fragments, trailing
+    slashes and tracking parameters, sorts the remaining query and reduces amazon
+    product urls to /dp/<ASIN>.
+    """
+    parsed = urlparse(url.strip())
+    scheme = (parsed.scheme or "https").lower()
+    host = parsed.netloc.lower()
+    if host.endswith(":443") and scheme == "https":
+        host = host[:-4]
+    if host.startswith("m."):
+        host = "www." + host[2:]
+    path = parsed.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    if "amazon." in host:
+        match = AMAZON_PRODUCT_PATH.search(path + "/")
+        if match:
+            path = f"/dp/{match.group(1).upper()}"
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True) if not _is_tracking_param(key)
+    ))
+    return urlunparse((scheme, host, path, "", query, ""))
+
+
+def product_id(url):
+    """
+    Return a site-scoped product id ("amazon.eg:B0XXXXXXXX", "noon.com/saudi:N123..."),
+    or None when the url is not a product page of a known store. Locale variants of
+    the same noon product share one id.
+    """
+    parsed = urlparse(canonicalize_url(url))
+    host = parsed.netloc[4:] if parsed.netloc.startswith("www.") else parsed.netloc
+    for site, pattern in PRODUCT_ID_PATTERNS:
+        if site not in host:
+            continue
+        match = pattern.search(parsed.path)
+        if not match:
+            return None
+        scope = host
+        locale = NOON_LOCALE.match(parsed.path) if site == "noon.com" else None
+        if locale:
+            scope = f"{host}/{locale.group(1).lower()}"
+        return f"{scope}:{match.group(1).upper()}"
+    return None
+
+
+def normalize_title(title):
+    """Lowercase a product title and keep only its words, for similarity checks"""
+    return " ".join(re.findall(r"\w+", (title or "").lower()))
+
+
+def title_similarity(first, second):
+    """Similarity ratio (0-1) of two product titles"""
+    first, second = normalize_title(first), normalize_title(second)
+    if not first or not second:
+        return 0.0
+    return SequenceMatcher(None, first, second).ratio()
+
+
+def normalize_query(query):
+    """Normalize a search query for use as a lookup key"""
+    return " ".join(query.lower().split())
@@ -1,9 +1,16 @@
 from crewai.tools import tool
-from typing import List
-from pydantic import BaseModel, Field
+from typing import List, Optional
+import re
+from pydantic import BaseModel, Field, ValidationError
+from urllib.parse import urlparse
 import os
 import json
 from crewai import Agent, Task
+from concurrency import HostRateLimiter, is_transient_error, retry_with_backoff, run_concurrently
+from urls import canonicalize_url
+from search_filters import ProductDeduplicator
+from run_metrics import NullMetrics
+from site_adapters import DEFAULT_ADAPTERS, adapter_for
 
 
 class ProductSpec(BaseModel):
@@ -19,27 +26,203 @@ class SingleExtractedProduct(BaseModel):
     product_current_price: float = Field(..., title="The current price of the product")
     product_original_price: float = Field(title="The original price of the product before discount. Set to None if no discount", default=None)
     product_discount_percentage: float = Field(title="The discount percentage of the product. Set to None if no discount", default=None)
+    product_currency: Optional[str] = Field(title="The ISO 4217 code of the prices' currency, e.g. EGP", default=None)
     product_specs: List[ProductSpec] = Field(..., title="The specifications of the product. Focus on the most important specs to compare.", min_items=1, max_items=5)
     agent_recommendation_rank: int = Field(..., title="The rank of the product to be considered in the final procurement report. (out of 5, Higher is Better) in the recommendation list ordering from the best to the worst")
     agent_recommendation_notes: List[str]  = Field(..., title="A set of notes why would you recommend or not recommend this product to the company, compared to other products.")
+    value_score: Optional[float] = Field(title="The computed value-for-money score of the product (0-1)", default=None)
 
 class AllExtractedProducts(BaseModel):
     products: List[SingleExtractedProduct]
 
+class ProductNote(BaseModel):
+    index: int = Field(..., title="The position of the product in the given list, starting at 1")
+    notes: List[str] = Field(..., title="Why would you recommend or not recommend this product to the company, compared to the other products")
+
+class ProductNotes(BaseModel):
+    products: List[ProductNote]
+
+class ScrapeFailure(BaseModel):
+    page_url: str
+    error: str
+    attempts: int
+
+
+# Fields the scraper is asked for; page_url is already known and the agent_recommendation_*
+# fields are only filled in by the agent after comparing all products
+SCRAPED_FIELDS = ("product_title", "product_image_url", "product_url", "product_current_price",
+                  "product_original_price", "product_discount_percentage", "product_currency", "product_specs")
+MAX_SPECS = 5
+
+
+def _compact_schema():
+    """One line `{field: description}` extraction schema, built from SingleExtractedProduct"""
+    fields = SingleExtractedProduct.model_fields
+    schema = {name: fields[name].title for name in SCRAPED_FIELDS}
+    schema["product_specs"] = f"Up to {MAX_SPECS} [specification_name, specification_value] pairs, the most important specs to compare"
+    return json.dumps(schema, separators=(",", ":"))
+
+
+SCRAPE_PROMPT = (
+    f"Extract the product on this page as one JSON object with these keys: {_compact_schema()}. "
+    "Prices are plain numbers without currency, which goes in product_currency; use null for anything missing."
+)
+
+# Value of the fields OutputRepairer had to pad; a placeholder spec is not a real spec
+PLACEHOLDER = "not listed"
+
+EASTERN_DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩٫٬", "0123456789.,")
+# Digits and separators; a space only joins digit groups like "1 299"
+NUMBER_PATTERN = re.compile(r"\d(?:[\d.,]|\s(?=\d{3}\b))*")
+CURRENCY_TOKENS = ("EGP", "SAR", "AED", "USD", "EUR", "GBP", "KWD", "QAR", "BHD", "OMR", "JOD",
+                   "L.E", "LE", "ج.م", "ر.س", "د.إ", "جنيه", "ريال", "درهم", "$", "€", "£")
+CURRENCY = "(?:" + "|".join(
+    rf"(?<![A-Za-z]){re.escape(token)}(?![A-Za-z])" if token[0].isascii() and token[0].isalpha() else re.escape(token)
+    for token in CURRENCY_TOKENS
+) + ")"
+CURRENCY_BEFORE = re.compile(CURRENCY + r"\s*$", re.IGNORECASE)
+CURRENCY_AFTER = re.compile(r"\s*" + CURRENCY, re.IGNORECASE)
+CURRENCY_SEARCH = re.compile(CURRENCY, re.IGNORECASE)
+# ISO 4217 codes of the currency symbols and local names in CURRENCY_TOKENS
+CURRENCY_CODES = {"L.E": "EGP", "LE": "EGP", "ج.م": "EGP", "جنيه": "EGP", "ر.س": "SAR", "ريال": "SAR",
+                  "د.إ": "AED", "درهم": "AED", "$": "USD", "€": "EUR", "£": "GBP"}
+
+
+def _to_float(number):
+    number = number.rstrip(".,")
+    if "," in number and "." in number:
+        # The last separator is the decimal one
+        if number.rfind(",") > number.rfind("."):
+            number = number.replace(".", "").replace(",", ".")
+        else:
+            number = number.replace(",", "")
+    elif "," in number:
+        head, _, tail = number.rpartition(",")
+        number = number.replace(",", "") if len(tail) == 3 else f"{head.replace(',', '')}.{tail}"
+    elif number.count(".") > 1:
+        number = number.replace(".", "")
+    return float(number)
+
+
+def parse_number(value):
+    """
+    Coerce a scraped number like "EGP 1,299.00", "1.299,50" or "١٢٠٠ ر.س" to float, or None.
+    Percentages are skipped and a number next to a currency wins over the first one, so
+    "Model 2024 - 1,299 EGP" and "15% off 1,299" both give 1299.0.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).translate(EASTERN_DIGITS)
+    first = None
+    for match in NUMBER_PATTERN.finditer(text):
+        number = re.sub(r"\s", "", match.group(0))
+        if text[match.end():].lstrip().startswith("%"):
+            continue
+        if CURRENCY_BEFORE.search(text, 0, match.start()) or CURRENCY_AFTER.match(text, match.end()):
+            return _to_float(number)
+        first = first or number
+    return None if first is None else _to_float(first)
+
+
+def parse_currency(value):
+    """The ISO 4217 code of a currency code, symbol or price text like "EGP 1,299" or "١٢٠٠ ر.س", or None"""
+    text = str(value or "").strip()
+    if re.fullmatch(r"[A-Za-z]{3}", text):
+        return text.upper()
+    match = CURRENCY_SEARCH.search(text)
+    if match is None:
+        return None
+    token = match.group(0)
+    return CURRENCY_CODES.get(token.upper(), CURRENCY_CODES.get(token, token.upper()))
+
+
+def _normalize_specs(specs):
+    """Coerce the scraped specs (list of pairs, dict or "name: value" strings) to at most MAX_SPECS ProductSpec dicts"""
+    if isinstance(specs, dict):
+        specs = [{"specification_name": name, "specification_value": value} for name, value in specs.items()]
+    normalized = []
+    for spec in specs or []:
+        if isinstance(spec, dict):
+            name = spec.get("specification_name") or spec.get("name")
+            value = spec.get("specification_value") or spec.get("value")
+        elif isinstance(spec, (list, tuple)) and len(spec) == 2:
+            name, value = spec
+        elif isinstance(spec, str) and ":" in spec:
+            name, value = spec.split(":", 1)
+        else:
+            continue
+        if name and value not in (None, ""):
+            normalized.append({"specification_name": str(name).strip(), "specification_value": str(value).strip()})
+    return normalized[:MAX_SPECS]
+
+
+def normalize_scraped_product(data):
+    """Validate-ready copy of a scraped product: numbers coerced, currency and discount derived, specs bounded"""
+    data = {**data}
+    if isinstance(data.get("product_title"), str):
+        data["product_title"] = " ".join(data["product_title"].split())
+    data["product_currency"] = next(filter(None, (parse_currency(data.get(field)) for field in (
+        "product_currency", "product_current_price", "product_original_price"))), None)
+    for field in ("product_current_price", "product_original_price", "product_discount_percentage"):
+        data[field] = parse_number(data.get(field))
+    current, original = data["product_current_price"], data["product_original_price"]
+    if original is not None and current is not None and original <= current:
+        data["product_original_price"] = data["product_discount_percentage"] = None
+    elif data["product_discount_percentage"] is None and original and current is not None:
+        data["product_discount_percentage"] = round((1 - current / original) * 100, 1)
+    data["product_specs"] = _normalize_specs(data.get("product_specs"))
+    return data
+
+
+def listed_specs(specs):
+    """The specs of a product dict without the placeholders OutputRepairer pads missing specs with"""
+    return [spec for spec in specs or [] if spec.get("specification_value") != PLACEHOLDER]
+
+
+def slim_product(product):
+    """The fields of an extracted product the scraping agent works with, without empty values"""
+    data = product.model_dump(exclude={"agent_recommendation_rank", "agent_recommendation_notes"}, exclude_none=True)
+    data["product_specs"] = listed_specs(data.get("product_specs"))
+    return data
+
 
 class ScrapingAgent:
-    def __init__(self, llm, output_dir="./output", scrape_client=None):
+    def __init__(self, llm, output_dir="./output", scrape_client=None, max_workers=5,
+                 max_retries=2, retry_backoff=2.0, rate_limiter=None, cache=None,
+                 metrics=None, price_store=None, rescrape_after=24 * 3600, country=None, category=None,
+                 fetcher=None, site_adapters=None):
         self.llm = llm
         self.output_dir = output_dir
         self.scrape_client = scrape_client
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.rate_limiter = rate_limiter or HostRateLimiter()
+        self.cache = cache
+        self.metrics = metrics or NullMetrics()
+        # Products scraped less than `rescrape_after` seconds ago are taken from the price store
+        self.price_store = price_store
+        self.rescrape_after = rescrape_after
+        self.country = country
+        self.category = category
+        # With a page fetcher, pages of the supported shops are parsed locally and only
+        # sent to smartscraper when their adapter fails
+        self.fetcher = fetcher
+        self.site_adapters = tuple(DEFAULT_ADAPTERS if site_adapters is None else site_adapters) if fetcher else ()
+        self.extraction_counts = {"adapter": 0, "smartscraper": 0}
     
         # Define models
         self.ProductSpec = ProductSpec
         self.SingleExtractedProduct = SingleExtractedProduct
         self.AllExtractedProducts = AllExtractedProducts
+        self.ScrapeFailure = ScrapeFailure
+        self.ProductNotes = ProductNotes
         
         # Create tool, agent and task
         self.scraping_tool = self._create_scraping_tool()
+        self.bulk_scraping_tool = self._create_bulk_scraping_tool()
         self.agent = self._create_agent()
         self.task = self._create_task()
     
@@ -56,21 +239,170 @@ class ScrapingAgent:
                 page_url="https://www.noon.com/saudi-ar/4-in-1-automatic-espresso-machine-1800w-2-6l-cappuccino-latte-espresso-grind-coffee-machine-with-automatic-milk-frother-20-bar-pump-pressure-touchscreen-coffee-maker-for-home-and-office-sk-04032/ZE622C99C49629E605245Z/p/?o=ze622c99c49629e605245z-1&shareId=a8f2656d-996c-42b1-a4f1-0ec14d7ae19c"
             )
             """
-            if not self.scrape_client:
+            if not self.scrape_client and not self.site_adapters:
                 return {"error": "Scrape client not configured"}
             
-            schema_json = json.dumps(self.SingleExtractedProduct.model_json_schema(), indent=2)
-            
-            details = self.scrape_client.smartscraper(
-                website_url=page_url,
-                user_prompt=f"Extract the following product information in JSON format:\n```json\n{schema_json}\n```\nFrom the web page. Focus on extracting accurate product details, prices, and specifications."
-            )
+            with self.metrics.timed("tool", "web_scraping_tool"):
+                try:
+                    product = self.scrape_product(page_url)
+                except Exception as e:
+                    return {"error": str(getattr(e, "last_error", e))}
             
             return {
-                "product": [details]
+                "product": [slim_product(product)]
             }
         
         return web_scraping_tool
+
+    def _create_bulk_scraping_tool(self):
+        """Create the bulk web scraping tool that scrapes a whole list of pages in parallel"""
+        @tool
+        def bulk_web_scraping_tool(page_urls: List[str]):
+            """
+            Scrape all the given product page urls in parallel and return the extracted products
+            together with the urls that could not be scraped. Prefer this over calling
+            web_scraping_tool once per url.
+            """
+            if not self.scrape_client and not self.site_adapters:
+                return {"error": "Scrape client not configured"}
+
+            with self.metrics.timed("tool", "bulk_web_scraping_tool"):
+                products, failures = self.scrape_pages(page_urls)
+            return {
+                "products": [slim_product(product) for product in products.products],
+                "failures": [{"page_url": failure.page_url, "error": failure.error} for failure in failures]
+            }
+
+        return bulk_web_scraping_tool
+
+    def _scrape(self, page_url):
+        """Send a single page to the scrape client, respecting the per-host rate limit and the response cache"""
+        def _call():
+            self.rate_limiter.wait(urlparse(page_url).netloc)
+            with self.metrics.timed("provider", "scrapegraph.smartscraper"):
+                return self.scrape_client.smartscraper(
+                    website_url=page_url,
+                    user_prompt=SCRAPE_PROMPT
+                )
+
+        if self.cache is None:
+            return _call()
+        return self.cache.get_or_compute(
+            "scrape",
+            [canonicalize_url(page_url), SCRAPE_PROMPT],
+            _call,
+            should_cache=lambda details: isinstance(details, dict) and not details.get("error")
+        )
+
+    def _extract(self, adapter, page_url):
+        """Fetch a page and parse it with its site adapter, respecting the per-host rate limit and the response cache"""
+        def _call():
+            self.rate_limiter.wait(urlparse(page_url).netloc)
+            with self.metrics.timed("provider", f"{adapter.name}.fetch"):
+                html = self.fetcher.fetch(page_url)
+            return adapter.extract(page_url, html)
+
+        if self.cache is None:
+            return _call()
+        # A parse that fails validation is not cached, so the page keeps falling back to smartscraper
+        return self.cache.get_or_compute("scrape", [canonicalize_url(page_url), adapter.name], _call,
+                                         should_cache=lambda details: self._is_valid(page_url, details))
+
+    def _is_valid(self, page_url, details):
+        try:
+            self._to_product(page_url, details)
+        except ValueError:
+            return False
+        return True
+
+    def _scrape_with_retries(self, page_url):
+        """
+        Scrape a page, retrying timeouts, 429 and 5xx errors with backoff. The request
+        timeout is the scrape client's own, so a timed-out call is not left running.
+        """
+        return retry_with_backoff(
+            lambda: self._scrape(page_url),
+            retries=self.max_retries,
+            backoff=self.retry_backoff,
+            retry_on=is_transient_error
+        )
+
+    def _to_product(self, page_url, details):
+        """Turn a smartscraper response into a SingleExtractedProduct"""
+        data = details.get("result", details) if isinstance(details, dict) else details
+        if isinstance(data, dict) and "product_title" not in data and len(data) == 1:
+            # The scraper sometimes nests the product under a single wrapper key
+            data = next(iter(data.values()))
+        if isinstance(data, list):
+            data = data[0] if data else {}
+        if not isinstance(data, dict):
+            raise ValueError(f"Unexpected scrape response: {details!r}")
+
+        # Missing optional prices keep their default instead of failing the float validation
+        data = {key: value for key, value in normalize_scraped_product(data).items() if value is not None}
+        data.setdefault("page_url", page_url)
+        data["product_url"] = data.get("product_url") or page_url
+        # Ranking and notes are filled in by the agent after comparing all products
+        data.setdefault("agent_recommendation_rank", 0)
+        data.setdefault("agent_recommendation_notes", [])
+        return self.SingleExtractedProduct.model_validate(data)
+
+    def scrape_product(self, page_url):
+        """Return the SingleExtractedProduct of a page, from the price store when it was scraped recently"""
+        if self.price_store is not None:
+            stored = self.price_store.recent(page_url, self.rescrape_after)
+            if stored is not None:
+                return self.SingleExtractedProduct.model_validate(stored)
+
+        product = None
+        adapter = adapter_for(page_url, self.site_adapters)
+        if adapter is not None:
+            try:
+                product = self._to_product(page_url, self._extract(adapter, page_url))
+                self.extraction_counts["adapter"] += 1
+            except Exception as e:
+                print(f"{adapter.name} adapter failed for {page_url} ({e}), falling back to smartscraper")
+        if product is None:
+            if not self.scrape_client:
+                raise ValueError("Scrape client not configured")
+            product = self._to_product(page_url, self._scrape_with_retries(page_url))
+            self.extraction_counts["smartscraper"] += 1
+        if self.price_store is not None:
+            self.price_store.record(product, country=self.country, category=self.category)
+        return product
+
+    def scrape_pages(self, page_urls):
+        """
+        Scrape all page urls in parallel.
+
+        Returns an AllExtractedProducts with every page that was scraped successfully and a
+        list of ScrapeFailure entries for the pages that were not.
+        """
+        deduplicator = ProductDeduplicator()
+        counts_before = dict(self.extraction_counts)
+        unique_urls = [url.strip() for url in page_urls if url and url.strip() and deduplicator.check(url.strip()) is None]
+        products, failures = [], []
+        for page_url, product, error in run_concurrently(self.scrape_product, unique_urls, self.max_workers):
+            if isinstance(error, (ValidationError, ValueError)):
+                failures.append(self.ScrapeFailure(page_url=page_url, error=f"Invalid product data: {error}", attempts=1))
+            elif error is not None:
+                failures.append(self.ScrapeFailure(
+                    page_url=page_url,
+                    error=str(getattr(error, "last_error", error)),
+                    attempts=getattr(error, "attempts", 1)
+                ))
+            else:
+                products.append(product)
+
+        print(f"Scraped {len(products)}/{len(unique_urls)} pages ({len(failures)} failed, "
+              f"{deduplicator.scrapes_avoided} duplicate scrapes avoided, "
+              f"{self.extraction_counts['adapter'] - counts_before['adapter']} parsed locally, "
+              f"{self.extraction_counts['smartscraper'] - counts_before['smartscraper']} by smartscraper)")
+        return self.AllExtractedProducts(products=products), failures
+
+    def scrape_search_results(self, search_results):
+        """Scrape every page of an AllSearchResult"""
+        return self.scrape_pages([result.url for result in search_results.results])
     
     def _create_agent(self):
         """Create the scraping agent"""
@@ -83,7 +415,7 @@ class ScrapingAgent:
                 "You can identify genuine product information and filter out irrelevant or incorrect data."
             ]),
             llm=self.llm,
-            tools=[self.scraping_tool],
+            tools=[self.bulk_scraping_tool, self.scraping_tool],
             verbose=True,
         )
     
@@ -92,12 +424,13 @@ class ScrapingAgent:
         return Task(
             description="\n".join([
                 "Extract detailed product information from e-commerce store page URLs obtained from search results.",
+                "Pass all the product URLs to bulk_web_scraping_tool in a single call; ignore the URLs it reports as failures.",
                 "For each product URL, extract the following information:",
                 "  - Product title, image URL, and product URL",
                 "  - Current price and original price (if on discount)",
                 "  - Key product specifications (focus on 3-5 most important specs for comparison)",
-                "  - Provide a recommendation rank (1-5) and notes explaining the ranking",
-                "Prioritize products with complete information and good value for money.",
+                "Set agent_recommendation_rank to 0 and agent_recommendation_notes to an empty list;",
+                "products are ranked by value for money in code afterwards.",
                 "Ensure all extracted data is accurate and relevant for procurement decision making."
             ]),
             expected_output="A JSON object containing detailed information for all extracted products",
@@ -106,6 +439,36 @@ class ScrapingAgent:
             agent=self.agent,
         )
     
+    def write_notes(self, products):
+        """Have the agent write recommendation notes for the given ranked products; returns {product_url: notes}"""
+        task = Task(
+            name="scraping.notes",
+            description="\n".join([
+                "Write recommendation notes for each of the top ranked products given as context.",
+                "They are ordered from the best value for money to the worst, with their computed value_score.",
+                "For each product write 2-3 short notes on why the company should or should not buy it,",
+                "compared to the other products, and refer to it by its index in the list (starting at 1)."
+            ]),
+            expected_output="A JSON object with the notes of every product",
+            output_json=self.ProductNotes,
+            agent=self.agent
+        )
+        context = [
+            {"index": index, **{key: value for key, value in product.items() if key != "agent_recommendation_notes"},
+             "product_specs": listed_specs(product.get("product_specs"))}
+            for index, product in enumerate(products, start=1)
+        ]
+        try:
+            output = task.execute_sync(context=json.dumps(context))
+            notes = (output.json_dict or json.loads(output.raw)).get("products", [])
+        except Exception as e:
+            print(f"Could not write product notes: {e}")
+            return {}
+        return {
+            products[note["index"] - 1]["product_url"]: note["notes"]
+            for note in notes if 1 <= note.get("index", 0) <= len(products)
+        }
+
     def set_context_dependency(self, dependency_task):
         """Set context dependency for the task"""
         self.task.context = [dependency_task]